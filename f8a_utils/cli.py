@@ -0,0 +1,123 @@
+"""Command line interface scanning manifest files for their dependencies.
+
+Every manifest is scanned in a worker process and one JSON record per manifest
+is written to stdout as soon as it is done, e.g.:
+
+    f8a-scan-dependencies --show-transitive --jobs 8 repos/ > dependencies.ndjson
+"""
+
+import os
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from f8a_utils.dependency_finder import DependencyFinder
+from f8a_utils.serializer import dumps
+
+# Manifest file names recognized when scanning directories.
+MANIFEST_ECOSYSTEMS = {
+    "npmlist.json": "npm",
+    "pylist.json": "pypi",
+    "dependencies.txt": "maven",
+    "gograph.txt": "golang",
+}
+
+
+def find_manifests(paths, ecosystem=None):
+    """Yield (path, ecosystem) for the given files and the manifests found in directories.
+
+    :param paths: list, manifest files or directories to search for manifests
+    :param ecosystem: str, ecosystem of all given files, detected from their name when None
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path, ecosystem or MANIFEST_ECOSYSTEMS.get(os.path.basename(path))
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename in MANIFEST_ECOSYSTEMS:
+                    yield os.path.join(root, filename), ecosystem or MANIFEST_ECOSYSTEMS[filename]
+
+
+def scan_manifest(path, ecosystem, show_transitive, normalized=False):
+    """Scan one manifest file and return its record, errors are reported in the record."""
+    record = {"path": path, "ecosystem": ecosystem}
+    try:
+        if ecosystem is None:
+            raise ValueError("Unable to detect the ecosystem, use --ecosystem")
+        with open(path, "rb") as f:
+            content = f.read()
+        manifest = {
+            "filepath": os.path.dirname(path),
+            "filename": os.path.basename(path),
+            "content": content
+        }
+        record.update(DependencyFinder.scan_and_find_dependencies(
+            ecosystem, [manifest], show_transitive, normalized))
+    except Exception as e:
+        record["error"] = "{t}: {e}".format(t=type(e).__name__, e=e)
+    return record
+
+
+def scan_manifests(manifests, show_transitive, jobs=1, normalized=False):
+    """Yield the records of the manifests in the order they finish.
+
+    At most twice as many manifests as there are jobs are queued at any time,
+    so arbitrarily long lists of manifests are scanned in constant memory.
+    """
+    if jobs <= 1:
+        for path, ecosystem in manifests:
+            yield scan_manifest(path, ecosystem, show_transitive, normalized)
+        return
+
+    manifests = iter(manifests)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = set()
+        while True:
+            for path, ecosystem in manifests:
+                pending.add(executor.submit(scan_manifest, path, ecosystem, show_transitive,
+                                            normalized))
+                if len(pending) >= 2 * jobs:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def get_parser():
+    """Return the argument parser of the command line interface."""
+    parser = argparse.ArgumentParser(
+        description="Scan manifest files for dependencies and print one JSON record per line.")
+    parser.add_argument("paths", nargs="+", metavar="PATH",
+                        help="manifest file or directory searched for {names}".format(
+                            names=", ".join(sorted(MANIFEST_ECOSYSTEMS))))
+    parser.add_argument("-e", "--ecosystem", choices=sorted(set(MANIFEST_ECOSYSTEMS.values())),
+                        help="ecosystem of all manifests, detected from file names by default")
+    parser.add_argument("-t", "--show-transitive", action="store_true",
+                        help="include transitive dependencies")
+    parser.add_argument("-n", "--normalized", action="store_true",
+                        help="list every package once, with dependencies as node indices")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of manifests scanned in parallel (default: %(default)s)")
+    return parser
+
+
+def main(argv=None, out=None):
+    """Run the command line interface, return 1 if any manifest failed, 0 otherwise."""
+    args = get_parser().parse_args(argv)
+    out = out or sys.stdout
+    failed = False
+    manifests = find_manifests(args.paths, args.ecosystem)
+    for record in scan_manifests(manifests, args.show_transitive, args.jobs, args.normalized):
+        failed = failed or "error" in record
+        out.write(dumps(record))
+        out.write("\n")
+        out.flush()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
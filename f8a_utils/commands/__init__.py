@@ -1,7 +1,12 @@
 """Commands package."""
 
-from f8a_utils.commands.command import ExternalCommand
+from f8a_utils.commands.command import ExternalCommand, set_metrics_hook
+from f8a_utils.commands.runner import ExternalCommandRunner
+from f8a_utils.commands.cached import CachedExternalCommand
 
 
 # Silence linters...
 assert ExternalCommand is not None
+assert set_metrics_hook is not None
+assert ExternalCommandRunner is not None
+assert CachedExternalCommand is not None
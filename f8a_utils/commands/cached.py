@@ -0,0 +1,145 @@
+"""ExternalCommand serving repeated runs on unchanged inputs from an on-disk cache."""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+
+from f8a_utils.commands.command import ExternalCommand
+from f8a_utils.default_config import EXTERNAL_COMMAND_CACHE_DIR, EXTERNAL_COMMAND_CACHE_MAX_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class CachedExternalCommand(ExternalCommand):
+    """ExternalCommand whose successful output is cached on disk.
+
+    Entries are keyed by the command argv, the working directory, the environment
+    overrides and the content hashes of the declared input files, e.g. go.sum or
+    pom.xml. The cache is bounded in size, least recently used entries are evicted.
+    A cache directory owned by another user or writable by others is not used.
+    """
+
+    def __init__(self, cmd, input_files, cache_dir=EXTERNAL_COMMAND_CACHE_DIR,
+                 max_size=EXTERNAL_COMMAND_CACHE_MAX_SIZE, metrics_hook=None):
+        """Create a command cached under cache_dir, nothing is run or read yet.
+
+        :param cmd: list, command to be executed
+        :param input_files: list, paths of the files the output depends on,
+                            relative paths are resolved against the cwd of the run
+        :param cache_dir: str, directory of the cache
+        :param max_size: int, maximum size of the cache in bytes
+        :param metrics_hook: callable invoked with the command once it has finished
+        """
+        super().__init__(cmd, metrics_hook=metrics_hook)
+        self.input_files = list(input_files)
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.cache_hit = False
+
+    def run(self, timeout=None, env=None, update_env=None,
+            stdin=None, cwd=None, raise_on_error=False, line_callback=None):
+        """Run the command unless its output for the same inputs is cached.
+
+        Parameters and return value are the same as for ExternalCommand.run(). Runs with
+        stdin or a line_callback are never cached.
+        """
+        self.cache_hit = False
+        if stdin is not None or line_callback is not None or not self._trusted_cache_dir():
+            return super().run(timeout=timeout, env=env, update_env=update_env, stdin=stdin,
+                               cwd=cwd, raise_on_error=raise_on_error,
+                               line_callback=line_callback)
+
+        start_time = time.time()
+        path = os.path.join(self.cache_dir, self._cache_key(env, update_env, cwd) + '.json')
+        entry = self._load(path)
+        if entry is not None:
+            self.cache_hit = True
+            self.stdout = entry['stdout']
+            self.stderr = entry['stderr']
+            self.rc = 0
+            self.expired = False
+            self.resource_usage = None
+            logger.debug('Command {cmd} served from cache {p}'.format(cmd=self._cmd, p=path))
+            return self._finish(start_time, raise_on_error)
+
+        succeeded = super().run(timeout=timeout, env=env, update_env=update_env, cwd=cwd,
+                                raise_on_error=raise_on_error)
+        if succeeded:
+            self._store(path, {'stdout': self.stdout, 'stderr': self.stderr})
+        return succeeded
+
+    def _cache_key(self, env, update_env, cwd):
+        """Return the hash of the command, its environment and the content of its inputs."""
+        key = hashlib.sha256()
+        key.update(json.dumps([self._cmd, env, update_env, cwd], sort_keys=True).encode())
+        for input_file in self.input_files:
+            path = os.path.join(cwd or '', input_file)
+            key.update(b'\0' + path.encode())
+            try:
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        key.update(chunk)
+            except OSError:
+                key.update(b'\0missing')
+        return key.hexdigest()
+
+    def _trusted_cache_dir(self):
+        """Create the cache directory if needed, return False if it can't be trusted."""
+        try:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            stat = os.stat(self.cache_dir)
+        except OSError as e:
+            logger.error('Unable to create cache directory {d}: {e}'.format(d=self.cache_dir, e=e))
+            return False
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+            # other users could plant entries
+            logger.error('Not using cache directory {d}, it is owned by another user or '
+                         'writable by others'.format(d=self.cache_dir))
+            return False
+        return True
+
+    @staticmethod
+    def _load(path):
+        """Return the cached entry, marking it as recently used, None on a miss."""
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def _store(self, path, entry):
+        """Atomically store the entry and evict least recently used ones above max_size."""
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error('Unable to cache the output of {cmd}: {e}'.format(cmd=self._cmd, e=e))
+            return
+        self._evict()
+
+    def _evict(self):
+        """Remove the least recently used entries until the cache fits max_size."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # already evicted by another process
+                pass
+            total -= size
@@ -1,28 +1,150 @@
 """A simple-to-use wrapper around subprocess.Popen(), for running external commands."""
+import locale
 import subprocess
 import time
 import logging
 import os
+import sys
+import mmap
 import signal
+import tempfile
+import threading
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
+# Number of trailing stderr lines kept when the output is streamed.
+STDERR_TAIL_LINES = 1000
+
+# Size in bytes above which run_binary() spills the output to a temporary file.
+SPILL_THRESHOLD = 16 * 1024 * 1024
+
+# Size of the reads from the stdout pipe in run_binary().
+CHUNK_SIZE = 64 * 1024
+
+_metrics_hook = None
+
+
+def set_metrics_hook(hook):
+    """Set the default callable invoked with every ExternalCommand once it has finished.
+
+    :param hook: callable taking the ExternalCommand, None to disable
+    """
+    global _metrics_hook
+    _metrics_hook = hook
+
+
+def _reap(proc):
+    """Wait for the child with os.wait4() and return its resource usage.
+
+    The exit status is stored in proc.returncode, so Popen never waits for the child
+    itself. None is returned if the child has already been reaped elsewhere.
+    """
+    try:
+        _, status, rusage = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        proc.wait()
+        return None
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+    return rusage
+
+
+def _read_spilled(stream, threshold):
+    """Read the binary stream to its end, spilling to a temporary file past threshold bytes.
+
+    :return: memoryview of the output kept in memory, or read-only mmap of the spilled file
+    """
+    buffer = bytearray()
+    spill = None
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if spill is None and len(buffer) + len(chunk) > threshold:
+            spill = tempfile.TemporaryFile()
+            spill.write(buffer)
+            buffer = None
+        if spill is None:
+            buffer += chunk
+        else:
+            spill.write(chunk)
+
+    if spill is None:
+        return memoryview(buffer)
+    with spill:
+        spill.flush()
+        # the mapping stays valid after the (already unlinked) file is closed
+        return mmap.mmap(spill.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _PipedProcess(object):
+    """A started command whose stderr is drained by a thread and timeout enforced by a timer."""
+
+    def __init__(self, command, proc, text, timeout, stderr_lines):
+        """Start draining stderr and the timeout timer of the started process.
+
+        :param command: ExternalCommand the process belongs to, expired by the timer
+        :param proc: subprocess.Popen of the command, with stdout and stderr piped
+        :param text: bool, True if the pipes are opened in text mode
+        :param timeout: int, seconds after which the process group is killed, None for no limit
+        :param stderr_lines: int, number of trailing stderr lines kept, None for all
+        """
+        self.proc = proc
+        self.text = text
+        self.start_time = time.time()
+        self.stderr_tail = deque(maxlen=stderr_lines)
+        self.stderr_reader = threading.Thread(target=self.stderr_tail.extend,
+                                              args=(proc.stderr,), daemon=True)
+        self.stderr_reader.start()
+        self.timer = None
+        if timeout is not None:
+            self.timer = threading.Timer(timeout, command._expire, args=(proc,))
+            self.timer.daemon = True
+            self.timer.start()
+
+
+def _resource_usage(rusage):
+    """Return the interesting fields of a resource.struct_rusage as a dict."""
+    if rusage is None:
+        return None
+    max_rss = rusage.ru_maxrss
+    if sys.platform == 'darwin':
+        # reported in bytes instead of kilobytes
+        max_rss //= 1024
+    return {
+        'user_time': rusage.ru_utime,
+        'system_time': rusage.ru_stime,
+        'max_rss_kb': max_rss,
+        'block_input': rusage.ru_inblock,
+        'block_output': rusage.ru_oublock,
+        'voluntary_context_switches': rusage.ru_nvcsw,
+        'involuntary_context_switches': rusage.ru_nivcsw
+    }
+
 
 class ExternalCommand(object):
     """Wrapper around subprocess.Popen(), for running external commands easily."""
 
-    def __init__(self, cmd):
+    def __init__(self, cmd, metrics_hook=None):
         """Init function for default value.
 
         :param cmd: list, command to be executed
+        :param metrics_hook: callable invoked with the command once it has finished,
+                             defaults to the hook given to set_metrics_hook()
         """
         if not isinstance(cmd, list):
             raise ValueError('cmd must be a list')
 
         self._cmd = cmd
         self._env = {}
+        self._metrics_hook = metrics_hook
 
         self.duration = None
+        # user/sys CPU time, max RSS, block I/O and context switches of the child
+        self.resource_usage = None
 
         self.stdin = None
         self.stdout = None
@@ -31,7 +153,7 @@ class ExternalCommand(object):
         self.expired = False
 
     def run(self, timeout=None, env=None, update_env=None,
-            stdin=None, cwd=None, raise_on_error=False):
+            stdin=None, cwd=None, raise_on_error=False, line_callback=None):
         """Run the command.
 
         :param timeout: int, timeout (in seconds), default: no timeout.
@@ -40,10 +162,23 @@ class ExternalCommand(object):
         :param stdin: str, standard input for the command.
         :param cwd: str, working directory for the command.
         :param raise_on_error: bool, raise subprocess.CalledProcessError() on failure
+        :param line_callback: callable, called with each stdout line while the command runs,
+                              stdout is then not stored in self.stdout
 
         :return: True on success, False otherwise. When raise_on_error is True,
                  then an exception is raised on failure.
         """
+        if line_callback is not None:
+            lines = self.iter_lines(timeout=timeout, env=env, update_env=update_env,
+                                    stdin=stdin, cwd=cwd, raise_on_error=raise_on_error)
+            try:
+                for line in lines:
+                    line_callback(line)
+            finally:
+                # stop the command right away if the callback raises
+                lines.close()
+            return not self.rc
+
         return self._exec(
             timeout=timeout,
             env=env,
@@ -53,84 +188,255 @@ class ExternalCommand(object):
             raise_on_error=raise_on_error
         )
 
-    def _prep(self):
-        """Prepare before running the command."""
-        pass
+    async def run_async(self, timeout=None, env=None, update_env=None,
+                        stdin=None, cwd=None, raise_on_error=False):
+        """Run the command as an asyncio subprocess, without blocking a thread.
 
-    def _cleanup(self):
-        """Cleanup after running the command.
-
-        This method is called always, regardless of success of failure.
+        Parameters, return value and the attributes set are the same as for run(),
+        except resource_usage which isn't available, as the event loop reaps the child.
         """
-        pass
-
-    def _exec(self, timeout=None, env=None, update_env=None,
-              stdin=None, cwd=None, raise_on_error=False):
+        import asyncio
 
         self._prep()
+        env = self._get_env(env, update_env)
+        self.resource_usage = None
 
-        if update_env:
-            env = env if env is not None else os.environ.copy()
-            env.update(self._env)
-            env.update(update_env)
-
-        proc = subprocess.Popen(
-            self._cmd,
+        proc = await asyncio.create_subprocess_exec(
+            *self._cmd,
             env=env,
             stdin=stdin,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            universal_newlines=True,
-            bufsize=0,
             cwd=cwd,
-            preexec_fn=os.setsid
+            start_new_session=True
         )
 
         start_time = time.time()
 
-        logger.debug('Running command "{cmd}"'.format(cmd=''.join(self._cmd)))
+        logger.debug('Running command "{cmd}"'.format(cmd=' '.join(self._cmd)))
+        communicate = asyncio.ensure_future(proc.communicate())
         try:
-            self.stdout, self.stderr = proc.communicate(timeout=timeout)
+            # shield the reads, so the output is complete even after a timeout
+            stdout, stderr = await asyncio.wait_for(asyncio.shield(communicate), timeout)
             self.rc = proc.returncode
 
-        except subprocess.TimeoutExpired:
-            # kill the whole process group - the process and its children
-            os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
+        except asyncio.TimeoutError:
+            self._kill(proc)
 
-            self.stdout, self.stderr = proc.communicate()
+            stdout, stderr = await communicate
             self.rc = 1
             self.expired = True
 
+        except asyncio.CancelledError:
+            # don't leave the process group running after the awaiting task is gone
+            self._kill(proc)
+            await communicate
+            self.rc = proc.returncode
+            self.duration = time.time() - start_time
+            self._cleanup()
+            raise
+
+        self.stdout = self._decode(stdout)
+        self.stderr = self._decode(stderr)
+        if self.expired:
             logger.error(
                 'Command "{cmd}" timed out after {t} seconds: {stderr}'.format(
                     cmd=' '.join(self._cmd), t=timeout, stderr=self.stderr
                 )
             )
 
+        return self._finish(start_time, raise_on_error)
+
+    @staticmethod
+    def _decode(data):
+        """Decode output the way universal_newlines=True does."""
+        text = data.decode(locale.getpreferredencoding(False))
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def iter_lines(self, timeout=None, env=None, update_env=None,
+                   stdin=None, cwd=None, raise_on_error=False):
+        """Run the command and yield its stdout lines while it runs.
+
+        Only the current line and the tail of stderr are kept in memory, self.stdout
+        stays None. Parameters are the same as for run(), the outcome is available in
+        self.rc once the generator is exhausted. Closing the generator early kills
+        the command.
+        """
+        piped = self._start_piped(True, timeout, env, update_env, stdin, cwd)
+        logger.debug('Streaming command "{cmd}"'.format(cmd=' '.join(self._cmd)))
+        completed = False
+        try:
+            for line in piped.proc.stdout:
+                yield line
+            completed = True
         finally:
-            self.duration = (time.time() - start_time)
-            self._cleanup()
+            self._stop_piped(piped, completed, timeout)
+            # a closed generator or a failing consumer is not reported by an exception
+            self._finish(piped.start_time, raise_on_error and completed)
+
+    def run_binary(self, timeout=None, env=None, update_env=None,
+                   stdin=None, cwd=None, raise_on_error=False,
+                   spill_threshold=SPILL_THRESHOLD):
+        """Run the command and keep its stdout as raw bytes, without any decoding.
+
+        Output up to spill_threshold bytes is kept in memory and self.stdout is a
+        memoryview of it, larger output is spilled to a temporary file and self.stdout
+        is a read-only mmap of that file. Both can be decoded or parsed without copying
+        them into a bytes object first. self.stderr holds the tail of stderr as bytes.
+        Other parameters and the return value are the same as for run().
 
-            if not self.rc:
-                # success
-                logger.debug(
-                    'Command {cmd} succeeded in {t} seconds'.format(cmd=self._cmd, t=self.duration)
+        :param spill_threshold: int, size in bytes above which the output goes to disk
+        """
+        piped = self._start_piped(False, timeout, env, update_env, stdin, cwd)
+        logger.debug('Running command "{cmd}"'.format(cmd=' '.join(self._cmd)))
+        completed = False
+        succeeded = False
+        try:
+            self.stdout = _read_spilled(piped.proc.stdout, spill_threshold)
+            completed = True
+        finally:
+            self._stop_piped(piped, completed, timeout)
+            succeeded = self._finish(piped.start_time, raise_on_error and completed)
+
+        return succeeded
+
+    def _start_piped(self, text, timeout, env, update_env, stdin, cwd,
+                     stderr_lines=STDERR_TAIL_LINES):
+        """Start the command, leaving stdout to the caller while a thread drains stderr.
+
+        :param stderr_lines: int, number of trailing stderr lines kept, None for all
+        """
+        self._prep()
+        env = self._get_env(env, update_env)
+
+        proc = subprocess.Popen(
+            self._cmd,
+            env=env,
+            stdin=stdin,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=text,
+            cwd=cwd,
+            start_new_session=True
+        )
+        if proc.stdin is not None:
+            # no input is written, like communicate() does, so the command sees EOF
+            proc.stdin.close()
+        return _PipedProcess(self, proc, text, timeout, stderr_lines)
+
+    def _stop_piped(self, piped, completed, timeout):
+        """Wait for a command started by _start_piped() and record its outcome.
+
+        :param completed: bool, False when stdout was not read to the end
+        """
+        proc = piped.proc
+        if not completed:
+            # the consumer gave up, don't leave the process group running
+            self._kill(proc)
+        proc.stdout.close()
+        # the timer still runs, a child closing stdout early is killed on timeout too
+        rusage = _reap(proc)
+        if piped.timer is not None:
+            piped.timer.cancel()
+        piped.stderr_reader.join()
+        proc.stderr.close()
+        self.stderr = ('' if piped.text else b'').join(piped.stderr_tail)
+        self.resource_usage = _resource_usage(rusage)
+        self.rc = 1 if self.expired else proc.returncode
+        if self.expired:
+            logger.error(
+                'Command "{cmd}" timed out after {t} seconds: {stderr}'.format(
+                    cmd=' '.join(self._cmd), t=timeout, stderr=self.stderr
+                )
+            )
+
+    @staticmethod
+    def _kill(proc):
+        """Kill the whole process group - the process and its children."""
+        try:
+            os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _expire(self, proc):
+        """Kill the process group when the timeout expires."""
+        # not proc.poll(), the child is reaped by _reap() only
+        if proc.returncode is None:
+            self.expired = True
+            self._kill(proc)
+
+    def _get_env(self, env, update_env):
+        """Return the environment for the command."""
+        if update_env:
+            env = env if env is not None else os.environ.copy()
+            env.update(self._env)
+            env.update(update_env)
+        return env
+
+    def _report_metrics(self):
+        """Pass the finished command to the metrics hook, its failures are only logged."""
+        hook = self._metrics_hook or _metrics_hook
+        if hook is None:
+            return
+        try:
+            hook(self)
+        except Exception:
+            logger.exception('Metrics hook failed for {cmd}'.format(cmd=self))
+
+    def _finish(self, start_time, raise_on_error):
+        """Record the duration, cleanup and report the outcome of the command.
+
+        :return: True on success, False otherwise. When raise_on_error is True,
+                 then an exception is raised on failure.
+        """
+        self.duration = (time.time() - start_time)
+        self._cleanup()
+        self._report_metrics()
+
+        if not self.rc:
+            # success
+            logger.debug(
+                'Command {cmd} succeeded in {t} seconds'.format(cmd=self._cmd, t=self.duration)
+            )
+            return True
+
+        # failure
+        # only log non-zero return code error here as timeout errors are logged elsewhere
+        if not self.expired:
+            logger.error(
+                'Command "{cmd}" returned {rc}: {stderr}'.format(
+                    cmd=' '.join(self._cmd), rc=self.rc, stderr=self.stderr
                 )
-            else:
-                # failure
-                # only log non-zero return code error here as timeout errors are logged elsewhere
-                if not self.expired:
-                    logger.error(
-                        'Command "{cmd}" returned {rc}: {stderr}'.format(
-                            cmd=' '.join(self._cmd), rc=self.rc, stderr=self.stderr
-                        )
-                    )
-
-                if raise_on_error:
-                    raise subprocess.CalledProcessError(self.rc, self._cmd, self.stderr)
-                return False
-
-        return True
+            )
+
+        if raise_on_error:
+            raise subprocess.CalledProcessError(self.rc, self._cmd, self.stderr)
+        return False
+
+    def _prep(self):
+        """Prepare before running the command."""
+        pass
+
+    def _cleanup(self):
+        """Cleanup after running the command.
+
+        This method is called always, regardless of success of failure.
+        """
+        pass
+
+    def _exec(self, timeout=None, env=None, update_env=None,
+              stdin=None, cwd=None, raise_on_error=False):
+        # not Popen.communicate(), it reaps the child and its resource usage is lost
+        piped = self._start_piped(True, timeout, env, update_env, stdin, cwd, stderr_lines=None)
+        logger.debug('Running command "{cmd}"'.format(cmd=' '.join(self._cmd)))
+        completed = False
+        try:
+            self.stdout = piped.proc.stdout.read()
+            completed = True
+        finally:
+            self._stop_piped(piped, completed, timeout)
+
+        return self._finish(piped.start_time, raise_on_error)
 
     def __str__(self):
         return 'ExternalCommand: ' + ' '.join(self._cmd)
@@ -0,0 +1,49 @@
+"""Run a batch of external commands in parallel."""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class ExternalCommandRunner(object):
+    """Run many ExternalCommands with a bounded number of them running at once."""
+
+    def __init__(self, max_workers=4):
+        """Create a runner, the commands are given to run().
+
+        :param max_workers: int, maximum number of commands running in parallel
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        self.max_workers = max_workers
+
+    def run(self, commands, **run_kwargs):
+        """Run the commands and wait for all of them.
+
+        Each command runs through ExternalCommand.run(), so a timed out command gets
+        its whole process group killed as usual.
+
+        :param commands: list of ExternalCommand, or of (ExternalCommand, dict) tuples where
+                         the dict overrides run() parameters, e.g. the timeout, for that command
+        :param run_kwargs: run() parameters shared by all the commands
+
+        :return: list of run() results, in the order of commands. When raise_on_error is True,
+                 the exception of the first failed command is raised once all have finished.
+        """
+        jobs = []
+        for command in commands:
+            kwargs = dict(run_kwargs)
+            if isinstance(command, tuple):
+                command, overrides = command
+                kwargs.update(overrides)
+            jobs.append((command, kwargs))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(command.run, **kwargs) for command, kwargs in jobs]
+            errors = [future.exception() for future in futures]
+
+        for (command, _), error in zip(jobs, errors):
+            if error is not None:
+                logger.error('{cmd} failed: {e}'.format(cmd=command, e=error))
+                raise error
+        return [future.result() for future in futures]
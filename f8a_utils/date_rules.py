@@ -0,0 +1,158 @@
+"""Compilation of vulnerability date range rules into sorted, merged intervals.
+
+Rules are provided in the following format:
+>#2020-09-17T13:19:13Z,>=#2020-09-17T13:19:13Z&<#2020-09-20T13:19:13Z and so on,
+where ',' separates alternatives and '&' joins conditions that must all hold.
+"""
+
+import calendar
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from functools import lru_cache
+
+RULE_DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+COMMIT_DATE_FORMAT = '%Y%m%d%H%M%S'
+
+# Dates have a precision of one second, so an interval is a closed range of
+# integer timestamps and strict bounds simply move by one second.
+UNBOUNDED = float('inf')
+
+
+def to_timestamp(date):
+    """Return the integer UTC timestamp of a naive UTC datetime."""
+    return calendar.timegm(date.timetuple())
+
+
+def _parse_condition(condition):
+    """Return the (start, end) interval of a single condition, or None if it can't match."""
+    if condition == '*':
+        return -UNBOUNDED, UNBOUNDED
+    operator, _, operand = condition.partition('#')
+    timestamp = to_timestamp(datetime.strptime(operand.split('#')[0], RULE_DATE_FORMAT))
+    if operator == "<":
+        return -UNBOUNDED, timestamp - 1
+    elif operator == "<=":
+        return -UNBOUNDED, timestamp
+    elif operator == ">":
+        return timestamp + 1, UNBOUNDED
+    elif operator == ">=":
+        return timestamp, UNBOUNDED
+    elif operator == "=":
+        return timestamp, timestamp
+    return None
+
+
+def _parse_rule(rule):
+    """Return the interval of conditions joined by '&', or None if it is empty."""
+    start, end = -UNBOUNDED, UNBOUNDED
+    for condition in rule.split('&'):
+        interval = _parse_condition(condition)
+        if interval is None:
+            return None
+        start, end = max(start, interval[0]), min(end, interval[1])
+    if start > end:
+        return None
+    return start, end
+
+
+class DateRangeRule:
+    """Date range rules compiled into sorted, non overlapping intervals."""
+
+    __slots__ = ('rule', 'starts', 'ends')
+
+    def __init__(self, rule, intervals):
+        """Init method for DateRangeRule class.
+
+        :param rule: str, the source rule
+        :param intervals: list of (start, end) timestamp tuples, possibly overlapping
+        """
+        self.rule = rule
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1] + 1:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    @property
+    def intervals(self):
+        """Return the list of (start, end) timestamp intervals."""
+        return list(zip(self.starts, self.ends))
+
+    def contains_timestamp(self, timestamp):
+        """Return True if the integer UTC timestamp lies within the intervals."""
+        i = bisect_right(self.starts, timestamp) - 1
+        return i >= 0 and timestamp <= self.ends[i]
+
+    def __contains__(self, date):
+        """Return True if the naive UTC datetime lies within the intervals."""
+        return self.contains_timestamp(to_timestamp(date))
+
+    def __repr__(self):
+        return 'DateRangeRule({!r})'.format(self.rule)
+
+
+@lru_cache(maxsize=1024)
+def _compile_date_rule(date_range_rules):
+    """Compile the rule string, results are cached by rule string."""
+    intervals = []
+    for rule in date_range_rules.split(','):
+        interval = _parse_rule(rule)
+        if interval is not None:
+            intervals.append(interval)
+    return DateRangeRule(date_range_rules, intervals)
+
+
+def compile_date_rule(date_range_rules):
+    """Compile date range rules into a DateRangeRule.
+
+    :param date_range_rules: str or already compiled DateRangeRule
+    :return: DateRangeRule
+    :raises ValueError: when a date doesn't follow the %Y-%m-%dT%H:%M:%SZ format
+    """
+    if isinstance(date_range_rules, DateRangeRule):
+        return date_range_rules
+    return _compile_date_rule(date_range_rules)
+
+
+def parse_commit_date(date_string):
+    """Return the integer UTC timestamp of a yyyymmddhhmmss date, None if it is invalid."""
+    try:
+        if len(date_string) == 14 and date_string.isdigit():
+            # fast path, avoids strptime for the common well formed input
+            date = datetime(int(date_string[:4]), int(date_string[4:6]), int(date_string[6:8]),
+                            int(date_string[8:10]), int(date_string[10:12]),
+                            int(date_string[12:]))
+        else:
+            date = datetime.strptime(date_string, COMMIT_DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    return to_timestamp(date)
+
+
+def evaluate_date_rules(date_strings, date_range_rules_list):
+    """Evaluate many yyyymmddhhmmss dates against many date range rules at once.
+
+    The dates are parsed once and sorted, then every interval of every rule selects
+    the matching dates with two binary searches.
+
+    :param date_strings: list of dates in yyyymmddhhmmss format
+    :param date_range_rules_list: list of rule strings or DateRangeRule objects
+    :return: list with a row per date holding a bool per rule, None rows for invalid dates
+    """
+    rules = [compile_date_rule(rule) for rule in date_range_rules_list]
+    timestamps = [parse_commit_date(date_string) for date_string in date_strings]
+    matrix = [None if timestamp is None else [False] * len(rules) for timestamp in timestamps]
+
+    order = sorted((i for i, timestamp in enumerate(timestamps) if timestamp is not None),
+                   key=timestamps.__getitem__)
+    sorted_timestamps = [timestamps[i] for i in order]
+    for j, rule in enumerate(rules):
+        for start, end in zip(rule.starts, rule.ends):
+            first = bisect_left(sorted_timestamps, start)
+            last = bisect_right(sorted_timestamps, end)
+            for k in range(first, last):
+                matrix[order[k]][j] = True
+    return matrix
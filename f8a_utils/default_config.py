@@ -3,4 +3,35 @@ import os
 
 SNYK_API_TOKEN_VALIDATION_URL = os.getenv('SNYK_API_TOKEN_VALIDATION_URL',
                                           'https://snyk.io/api/v1/verify/token')
+# Seconds for which valid and invalid Snyk token verifications are cached.
+SNYK_TOKEN_VALID_TTL = int(os.getenv('SNYK_TOKEN_VALID_TTL', 3600))
+SNYK_TOKEN_INVALID_TTL = int(os.getenv('SNYK_TOKEN_INVALID_TTL', 300))
+# Comma separated Fernet keys, the first one encrypts, all of them decrypt.
 ENCRYPTION_KEY_FOR_SNYK_TOKEN = os.getenv('ENCRYPTION_KEY_FOR_SNYK_TOKEN', 'SNYK')
+
+# SQLite file caching the dates of commit and tag SHAs, disabled when empty.
+GITHUB_COMMIT_DATE_CACHE_PATH = os.getenv('GITHUB_COMMIT_DATE_CACHE_PATH', '')
+
+# Seconds a repository's tag listing is reused to resolve versions to SHAs.
+GITHUB_TAG_CACHE_TTL = int(os.getenv('GITHUB_TAG_CACHE_TTL', 3600))
+
+# SQLite file persisting ETag/Last-Modified validators of GitHub responses,
+# kept in memory when empty.
+GITHUB_HTTP_CACHE_PATH = os.getenv('GITHUB_HTTP_CACHE_PATH', '')
+
+# Maximum number of concurrent requests of the asyncio GitHub client.
+GITHUB_MAX_CONCURRENCY = int(os.getenv('GITHUB_MAX_CONCURRENCY', 10))
+
+# Directory and size limit (in bytes) of the CachedExternalCommand output cache,
+# the directory must belong to the user and must not be writable by others.
+EXTERNAL_COMMAND_CACHE_DIR = os.getenv(
+    'EXTERNAL_COMMAND_CACHE_DIR',
+    os.path.join(os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                 'f8a-command-cache'))
+EXTERNAL_COMMAND_CACHE_MAX_SIZE = int(os.getenv('EXTERNAL_COMMAND_CACHE_MAX_SIZE',
+                                                1024 * 1024 * 1024))
+
+# Total latency budget in seconds and maximum number of attempts of outbound calls,
+# retries stop as soon as either is spent.
+OUTBOUND_CALL_BUDGET = float(os.getenv('OUTBOUND_CALL_BUDGET', 30))
+OUTBOUND_CALL_MAX_ATTEMPTS = int(os.getenv('OUTBOUND_CALL_MAX_ATTEMPTS', 4))
@@ -27,12 +27,57 @@ class DependencyFinder():
     """Implementation of methods to find dependencies from manifest file."""
 
     @staticmethod
-    def scan_and_find_dependencies(ecosystem, manifests, show_transitive):
-        """Scan the dependencies files to fetch transitive deps."""
+    def scan_and_find_dependencies(ecosystem, manifests, show_transitive, normalized=False):
+        """Scan the dependencies files to fetch transitive deps.
+
+        With normalized, every manifest's details list each package once in a nodes table
+        with the direct dependencies and the edges between them as indices into it,
+        instead of the _resolved list repeating the transitive deps of every direct one.
+        """
+        if type(show_transitive) is not bool:
+            show_transitive = show_transitive == "true"
+        dependency_tree_generator = get_dependency_tree_generator(ecosystem)()
+        return dependency_tree_generator.get_dependencies(manifests, show_transitive, normalized)
+
+    @staticmethod
+    def scan_command_output(ecosystem, command, filepath, filename, show_transitive,
+                            normalized=False, **run_kwargs):
+        """Run the command and parse its stdout into the dependency tree while it runs.
+
+        The output, e.g. of go mod graph or of the maven dependency:tree dot output,
+        is fed to the tree generator line by line and never held in memory as a whole.
+
+        :param ecosystem: Ecosystem
+        :param command: list or ExternalCommand, command printing the manifest content
+        :param filepath: str, path reported as manifest_file_path
+        :param filename: str, name reported as manifest_file
+        :param show_transitive: bool or "true", whether to include transitive deps
+        :param normalized: bool, whether to return the normalized format
+        :param run_kwargs: arguments passed to ExternalCommand.iter_lines()
+        """
         if type(show_transitive) is not bool:
             show_transitive = show_transitive == "true"
+        from f8a_utils.commands import ExternalCommand
+
+        if not isinstance(command, ExternalCommand):
+            command = ExternalCommand(command)
+        run_kwargs.setdefault('raise_on_error', True)
         dependency_tree_generator = get_dependency_tree_generator(ecosystem)()
-        return dependency_tree_generator.get_dependencies(manifests, show_transitive)
+        lines = command.iter_lines(**run_kwargs)
+        try:
+            return dependency_tree_generator.get_dependencies_from_stream(
+                lines, filepath, filename, show_transitive, normalized)
+        finally:
+            lines.close()
+
+    @staticmethod
+    def get_dependency_query(ecosystem, content):
+        """Return the DependencyQuery answering reverse dependency queries on a manifest.
+
+        :param ecosystem: Ecosystem
+        :param content: str, bytes or buffer, manifest content as for scan_and_find_dependencies
+        """
+        return get_dependency_tree_generator(ecosystem)().get_dependency_query(content)
 
     @staticmethod
     def clean_version(version):
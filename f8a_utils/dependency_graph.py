@@ -0,0 +1,172 @@
+"""Compact dependency graph shared by the tree generators of all ecosystems."""
+
+from array import array
+
+
+class DependencyGraph:
+    """Directed graph of packages with interned node ids and CSR adjacency arrays.
+
+    Packages are identified by a hashable key, e.g. a maven coordinate string, and
+    interned to consecutive integer ids. Edges are collected in two arrays and turned
+    into compressed sparse rows (offsets and targets) on first traversal, keeping the
+    order in which edges were added and dropping duplicates. The reverse adjacency is
+    built the same way on the first call of predecessors().
+    """
+
+    def __init__(self):
+        """Create an empty graph, nodes and edges are added with add_node(), add_edge()."""
+        self._ids = {}
+        self.keys = []
+        self.data = []
+        self.roots = []
+        self._root_set = set()
+        self._sources = array('l')
+        self._targets = array('l')
+        self._offsets = None
+        self._adjacency = None
+        self._reverse_offsets = None
+        self._reverse_adjacency = None
+
+    def __len__(self):
+        """Return the number of nodes."""
+        return len(self.keys)
+
+    def add_node(self, key, data=None):
+        """Intern the key and return its node id, data is kept from the first call giving it."""
+        node = self._ids.get(key)
+        if node is None:
+            node = len(self.keys)
+            self._ids[key] = node
+            self.keys.append(key)
+            self.data.append(data)
+        elif data is not None and self.data[node] is None:
+            self.data[node] = data
+        return node
+
+    def add_edge(self, source, target):
+        """Add an edge between the nodes of the given keys, return their ids."""
+        source_id = self.add_node(source)
+        target_id = self.add_node(target)
+        self._sources.append(source_id)
+        self._targets.append(target_id)
+        self._offsets = None
+        self._reverse_offsets = None
+        return source_id, target_id
+
+    def add_root(self, key, data=None):
+        """Mark the node of the key as a direct dependency, return its id."""
+        node = self.add_node(key, data)
+        if node not in self._root_set:
+            self._root_set.add(node)
+            self.roots.append(node)
+        return node
+
+    def node_id(self, key):
+        """Return the id of the key, None if it isn't in the graph."""
+        return self._ids.get(key)
+
+    def freeze(self):
+        """Build the CSR arrays, called implicitly before the graph is traversed."""
+        if self._offsets is not None:
+            return
+        count = len(self.keys)
+        offsets = array('l', [0]) * (count + 1)
+        for source in self._sources:
+            offsets[source + 1] += 1
+        for node in range(count):
+            offsets[node + 1] += offsets[node]
+
+        # stable counting sort of the edges by source
+        positions = offsets[:-1]
+        adjacency = array('l', [0]) * len(self._targets)
+        for source, target in zip(self._sources, self._targets):
+            adjacency[positions[source]] = target
+            positions[source] += 1
+
+        # drop duplicate edges, last_source[t] is the last source seen pointing to t
+        last_source = array('l', [-1]) * count
+        deduplicated = array('l')
+        start = 0
+        for node in range(count):
+            end = offsets[node + 1]
+            offsets[node] = len(deduplicated)
+            for i in range(start, end):
+                target = adjacency[i]
+                if last_source[target] != node:
+                    last_source[target] = node
+                    deduplicated.append(target)
+            start = end
+        offsets[count] = len(deduplicated)
+
+        self._offsets = offsets
+        self._adjacency = deduplicated
+
+    def _freeze_reverse(self):
+        """Build the CSR arrays of the reversed edges from the frozen ones."""
+        self.freeze()
+        if self._reverse_offsets is not None:
+            return
+        count = len(self.keys)
+        offsets, adjacency = self._offsets, self._adjacency
+        reverse_offsets = array('l', [0]) * (count + 1)
+        for target in adjacency:
+            reverse_offsets[target + 1] += 1
+        for node in range(count):
+            reverse_offsets[node + 1] += reverse_offsets[node]
+        positions = reverse_offsets[:-1]
+        reverse_adjacency = array('l', [0]) * len(adjacency)
+        for source in range(count):
+            for i in range(offsets[source], offsets[source + 1]):
+                target = adjacency[i]
+                reverse_adjacency[positions[target]] = source
+                positions[target] += 1
+        self._reverse_offsets = reverse_offsets
+        self._reverse_adjacency = reverse_adjacency
+
+    def predecessors(self, node):
+        """Return the ids of the nodes with an edge to the node, in ascending order."""
+        self._freeze_reverse()
+        return self._reverse_adjacency[self._reverse_offsets[node]:self._reverse_offsets[node + 1]]
+
+    def successors(self, node):
+        """Return the ids of the direct successors of the node, in the order edges were added."""
+        self.freeze()
+        return self._adjacency[self._offsets[node]:self._offsets[node + 1]]
+
+    def closure(self, node, reverse=False):
+        """Return the ids of all nodes reachable from the node in depth-first preorder.
+
+        :param node: int, id of the start node, it's only listed if it's part of a cycle
+        :param reverse: bool, visit successors in the reverse order of their edges
+        """
+        self.freeze()
+        offsets, adjacency = self._offsets, self._adjacency
+        seen = bytearray(len(self.keys))
+        order = []
+
+        def positions(n):
+            if reverse:
+                return iter(range(offsets[n + 1] - 1, offsets[n] - 1, -1))
+            return iter(range(offsets[n], offsets[n + 1]))
+
+        stack = [positions(node)]
+        while stack:
+            for i in stack[-1]:
+                target = adjacency[i]
+                if not seen[target]:
+                    seen[target] = 1
+                    order.append(target)
+                    stack.append(positions(target))
+                    break
+            else:
+                stack.pop()
+        return order
+
+    def stats(self):
+        """Return the number of nodes, unique edges and roots of the graph."""
+        self.freeze()
+        return {
+            "nodes": len(self.keys),
+            "edges": len(self._adjacency),
+            "roots": len(self.roots)
+        }
@@ -0,0 +1,104 @@
+"""Reverse dependency and "why is this package here" queries over a dependency graph."""
+
+from array import array
+from collections import defaultdict, deque
+
+
+class DependencyQuery:
+    """Answer which packages pull in a package and by what path.
+
+    A breadth-first search from all direct dependencies at once is run up front, it
+    records for every reachable package its parent on a shortest path from the
+    nearest direct dependency. Together with the reverse adjacency of the graph,
+    dependents and shortest paths are answered in time proportional to their size.
+    Packages not reachable from a direct dependency, e.g. maven test dependencies
+    or the project module itself, are not part of any answer.
+    """
+
+    def __init__(self, graph, to_json, roots=None):
+        """Index the packages reachable from the roots, the graph must not change afterwards.
+
+        :param graph: DependencyGraph of the manifest
+        :param to_json: callable returning the dict of a node id with its package and version
+        :param roots: list, ids of the direct dependencies, graph.roots by default
+        """
+        self.graph = graph
+        self.roots = list(graph.roots if roots is None else roots)
+        self._distance, self._parent = self._search(self.roots)
+        self._nodes = {}
+        self._by_package = defaultdict(list)
+        for node in range(len(graph)):
+            if self._distance[node] >= 0:
+                self._nodes[node] = to_json(node)
+                self._by_package[self._nodes[node]['package']].append(node)
+
+    def _search(self, roots):
+        """Run the multi-source breadth-first search, return the distance and parent arrays."""
+        count = len(self.graph)
+        distance = array('l', [-1]) * count
+        parent = array('l', [-1]) * count
+        queue = deque()
+        for root in roots:
+            if distance[root] < 0:
+                distance[root] = 0
+                queue.append(root)
+        while queue:
+            node = queue.popleft()
+            for target in self.graph.successors(node):
+                if distance[target] < 0:
+                    distance[target] = distance[node] + 1
+                    parent[target] = node
+                    queue.append(target)
+        return distance, parent
+
+    def find(self, package, version=None):
+        """Return the node ids of the package, of all its versions if version is None."""
+        return [node for node in self._by_package.get(package, [])
+                if version is None or self._nodes[node]['version'] == version]
+
+    def __contains__(self, package):
+        """Return True if the package is a direct or transitive dependency."""
+        return package in self._by_package
+
+    def dependents(self, package, version=None):
+        """Return the packages depending on the package directly."""
+        seen = set()
+        dependents = []
+        for node in self.find(package, version):
+            for source in self.graph.predecessors(node):
+                if self._distance[source] >= 0 and source not in seen:
+                    seen.add(source)
+                    dependents.append(dict(self._nodes[source]))
+        return dependents
+
+    def direct_dependents(self, package, version=None):
+        """Return the direct dependencies pulling in the package, in manifest order.
+
+        A direct dependency is listed for itself as well.
+        """
+        nodes = self.find(package, version)
+        seen = set(nodes)
+        queue = deque(nodes)
+        while queue:
+            node = queue.popleft()
+            for source in self.graph.predecessors(node):
+                if self._distance[source] >= 0 and source not in seen:
+                    seen.add(source)
+                    queue.append(source)
+        return [dict(self._nodes[root]) for root in self.roots if root in seen]
+
+    def shortest_path(self, package, version=None):
+        """Return the shortest path from a direct dependency to the package, None if not present.
+
+        The path starts with the direct dependency and ends with the package.
+        """
+        nodes = self.find(package, version)
+        if not nodes:
+            return None
+        node = min(nodes, key=lambda n: self._distance[n])
+        path = []
+        while node >= 0:
+            path.append(dict(self._nodes[node]))
+            node = self._parent[node]
+        path.reverse()
+        return path
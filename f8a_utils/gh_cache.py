@@ -0,0 +1,185 @@
+"""Persistent caches for GitHub api lookups."""
+
+import os
+import re
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+_logger = logging.getLogger(__name__)
+
+FULL_SHA_REGEX = re.compile(r'^[0-9a-f]{40}$')
+
+# Number of responses kept by a ConditionalRequestCache, in memory or in its database file.
+MEMORY_CACHE_SIZE = 10000
+
+_conditional_request_caches = {}
+_conditional_request_caches_lock = threading.Lock()
+
+
+class SQLiteStore:
+    """Base class of the caches stored in a SQLite file shared by worker processes."""
+
+    SCHEMA = ''
+
+    def __init__(self, path):
+        """Init method for SQLiteStore class.
+
+        :param path: str, path of the SQLite database file
+        """
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        """Return the connection of the current thread, opening it when needed."""
+        conn = getattr(self._local, 'conn', None)
+        # connections must not be reused across a fork
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(self.SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _execute(self, query, params):
+        """Execute the query and return the first row, None on errors."""
+        try:
+            return self._connection().execute(query, params).fetchone()
+        except sqlite3.Error as e:
+            _logger.error("Unable to use the cache {p}: {e}".format(p=self.path, e=e))
+            return None
+
+
+class CommitDateCache(SQLiteStore):
+    """Cache of commit and tag dates keyed by (org, name, sha), stored in SQLite.
+
+    A full SHA names immutable content, so the entries never expire. SQLite takes
+    care of the locking, so one cache file can be shared by many worker processes.
+    """
+
+    SCHEMA = 'CREATE TABLE IF NOT EXISTS commit_dates (' \
+             'org TEXT NOT NULL, name TEXT NOT NULL, sha TEXT NOT NULL, ' \
+             'kind TEXT NOT NULL, date TEXT NOT NULL, ' \
+             'PRIMARY KEY (org, name, sha, kind))'
+
+    @staticmethod
+    def is_cacheable(sha):
+        """Return True if the sha is a full SHA, short ones may become ambiguous."""
+        return bool(sha) and FULL_SHA_REGEX.match(sha.lower()) is not None
+
+    def get(self, org, name, sha, kind):
+        """Return the cached date or None.
+
+        :param kind: str, 'commit' or 'tag', the kind of object the sha names
+        """
+        row = self._execute(
+            'SELECT date FROM commit_dates WHERE org = ? AND name = ? AND sha = ? AND kind = ?',
+            (org.lower(), name.lower(), sha.lower(), kind))
+        return row[0] if row else None
+
+    def set(self, org, name, sha, kind, date):
+        """Store the date of the sha, the first stored value wins."""
+        self._execute(
+            'INSERT OR IGNORE INTO commit_dates (org, name, sha, kind, date) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (org.lower(), name.lower(), sha.lower(), kind, date))
+
+
+def get_conditional_request_cache(path):
+    """Return the process wide ConditionalRequestCache for the path."""
+    with _conditional_request_caches_lock:
+        if path not in _conditional_request_caches:
+            _conditional_request_caches[path] = ConditionalRequestCache(path)
+        return _conditional_request_caches[path]
+
+
+class ConditionalRequestCache(SQLiteStore):
+    """Cache of GET responses with their ETag/Last-Modified validators, keyed by url.
+
+    Sending the validators back turns unchanged resources into 304 responses,
+    which GitHub doesn't count against the rate limit. Without a path the
+    responses are kept in memory, otherwise they persist in a SQLite file.
+    """
+
+    SCHEMA = 'CREATE TABLE IF NOT EXISTS responses (' \
+             'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body TEXT NOT NULL)'
+
+    def __init__(self, path=None):
+        """Init method for ConditionalRequestCache class.
+
+        :param path: str, path of the SQLite database file, None to keep responses in memory
+        """
+        super().__init__(path)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _get(self, url):
+        """Return the (etag, last_modified, body) entry of the url."""
+        if self.path:
+            return self._execute(
+                'SELECT etag, last_modified, body FROM responses WHERE url = ?', (url,))
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is not None:
+                self._memory.move_to_end(url)
+            return entry
+
+    def validators(self, url):
+        """Return the conditional request headers for the url."""
+        entry = self._get(url)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return {}
+        headers = {}
+        if entry[0]:
+            headers['If-None-Match'] = entry[0]
+        if entry[1]:
+            headers['If-Modified-Since'] = entry[1]
+        return headers
+
+    def get_not_modified(self, url):
+        """Return the cached json of the url, to be used on a 304 response."""
+        entry = self._get(url)
+        with self._lock:
+            self.not_modified += 1
+            if entry is not None:
+                self.hits += 1
+        if entry is None:
+            return None
+        return json.loads(entry[2])
+
+    def store(self, url, headers, body):
+        """Store the body of a 200 response when it carries validators."""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not (etag or last_modified):
+            return
+        if self.path:
+            self._execute(
+                'INSERT OR REPLACE INTO responses (url, etag, last_modified, body) '
+                'VALUES (?, ?, ?, ?)', (url, etag, last_modified, body))
+            # a replaced row gets the highest rowid, so the oldest stored ones go first
+            self._execute(
+                'DELETE FROM responses WHERE rowid <= (SELECT MAX(rowid) FROM responses) - ?',
+                (MEMORY_CACHE_SIZE,))
+            return
+        with self._lock:
+            self._memory[url] = (etag, last_modified, body)
+            self._memory.move_to_end(url)
+            if len(self._memory) > MEMORY_CACHE_SIZE:
+                self._memory.popitem(last=False)
+
+    def stats(self):
+        """Return the hit, miss and 304 counters.
+
+        Hits are 304s answered from the cache, misses requests sent without validators.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'not_modified': self.not_modified}
@@ -0,0 +1,145 @@
+"""Rate limit aware scheduling of GitHub tokens."""
+
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+_logger = logging.getLogger(__name__)
+
+# Quota assumed for a token until GitHub reports its real rate limit.
+DEFAULT_RATE_LIMIT = 5000
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_token_pool(tokens):
+    """Return the process wide pool for the given tokens, so quotas are tracked across instances."""
+    key = tuple(tokens)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = GithubTokenPool(tokens)
+        return _pools[key]
+
+
+def _retry_after(headers, status_code):
+    """Return the time until which a rate limited request must not be retried, None if unknown.
+
+    Retry-After is either a number of seconds or an HTTP-date, other values are ignored.
+    """
+    if status_code not in (403, 429):
+        return None
+    value = headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return time.time() + float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        _logger.warning("Ignoring invalid Retry-After header {v!r}.".format(v=value))
+        return None
+
+
+def _mask(token):
+    """Return a printable token identifier."""
+    return "..." + token[-4:]
+
+
+class GithubTokenPool:
+    """Pool of GitHub tokens scheduled by their remaining rate limit quota.
+
+    Quotas are learnt from the X-RateLimit-* response headers, per token and per
+    rate limit resource (core, graphql, search...). The token with the most
+    remaining requests is always picked, exhausted tokens are parked until reset.
+    """
+
+    def __init__(self, tokens):
+        """Init method for GithubTokenPool class.
+
+        :param tokens: list, GitHub tokens
+        """
+        self.tokens = [token for token in tokens if token]
+        self._quotas = {}
+        self._lock = threading.Lock()
+
+    def _remaining(self, token, resource, now):
+        """Return the expected remaining quota of the token."""
+        quota = self._quotas.get((token, resource))
+        if quota is None:
+            return DEFAULT_RATE_LIMIT
+        if quota['reset'] <= now:
+            return quota['limit']
+        return quota['remaining']
+
+    def select(self, resource='core'):
+        """Return the token with the most headroom, None when the pool is empty."""
+        if not self.tokens:
+            _logger.info("Could not select a gh token.")
+            return None
+        now = time.time()
+        with self._lock:
+            remaining = {token: self._remaining(token, resource, now) for token in self.tokens}
+            most = max(remaining.values())
+            if most <= 0:
+                # every token is parked, use the one that is reset first
+                token = min(self.tokens, key=lambda t: self._quotas[(t, resource)]['reset'])
+                _logger.warning("All gh tokens are rate limited, until {}.".format(
+                    self._quotas[(token, resource)]['reset']))
+                return token
+            token = random.choice([t for t in self.tokens if remaining[t] == most])
+            quota = self._quotas.get((token, resource))
+            if quota is not None and quota['reset'] > now:
+                # reserve the request, so concurrent callers spread over the tokens
+                quota['remaining'] -= 1
+            return token
+
+    def update(self, token, headers, status_code=None):
+        """Record the quota reported by the response headers of a request made with the token."""
+        if token not in self.tokens or headers is None:
+            return
+        resource = headers.get('X-RateLimit-Resource', 'core')
+        retry_after = _retry_after(headers, status_code)
+        try:
+            limit = int(headers.get('X-RateLimit-Limit', DEFAULT_RATE_LIMIT))
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset = float(headers['X-RateLimit-Reset'])
+        except (KeyError, TypeError, ValueError):
+            if retry_after is None:
+                return
+            # secondary rate limits only tell how long to back off
+            limit = DEFAULT_RATE_LIMIT
+            remaining = 0
+            reset = retry_after
+        if retry_after is not None:
+            remaining = 0
+            reset = max(reset, retry_after)
+        with self._lock:
+            self._quotas[(token, resource)] = {
+                'limit': limit,
+                'remaining': remaining,
+                'reset': reset
+            }
+        if remaining <= 0:
+            _logger.info("Parking gh token {t} until {r}.".format(t=_mask(token), r=reset))
+
+    def stats(self):
+        """Return the known quota of every token and resource, keyed by masked token."""
+        now = time.time()
+        stats = {}
+        with self._lock:
+            for token in self.tokens:
+                stats[_mask(token)] = {}
+            for (token, resource), quota in self._quotas.items():
+                remaining = self._remaining(token, resource, now)
+                stats[_mask(token)][resource] = {
+                    'limit': quota['limit'],
+                    'remaining': remaining,
+                    'reset': quota['reset'],
+                    'parked': remaining <= 0
+                }
+        return stats
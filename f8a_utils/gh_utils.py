@@ -17,52 +17,274 @@
 
 """Utility file to fetch github details."""
 
-import random
+import re
+import time
 import logging
-import requests
+import threading
 from os import environ
-from datetime import datetime
+from datetime import datetime, timezone
 import base64
+from f8a_utils.default_config import GITHUB_COMMIT_DATE_CACHE_PATH, GITHUB_TAG_CACHE_TTL, \
+    GITHUB_HTTP_CACHE_PATH
+from f8a_utils.date_rules import compile_date_rule, evaluate_date_rules
+from f8a_utils.gh_cache import CommitDateCache, get_conditional_request_cache
+from f8a_utils.gh_token_pool import get_token_pool
+from f8a_utils.retry_policy import DEFAULT_RETRY_POLICY
 
 _logger = logging.getLogger(__name__)
 
 msg = "ZTI4YTBkMGUxMjM4YWY1NmJhZGEzN2U4NjJjMDQwZGY2MDlkYzZiYSw5NWNhO" \
       "DliMzM0OWMwMWY0NDEzMGU3NTk4YjUwMzJlNjNmMjk5M2Nm"
 
+# Page size used when listing all the tags of a repository.
+TAGS_PAGE_SIZE = 100
+
+# Tag to SHA maps of repositories, {(org, name): (expiry time, {tag: sha})}.
+_tag_cache = {}
+_tag_cache_lock = threading.Lock()
+
+# Number of aliased repository lookups sent in a single GraphQL request.
+GRAPHQL_BATCH_SIZE = 50
+
+GRAPHQL_OBJECT_FIELDS = """
+    object(expression: $e{i}) {{
+      ... on Commit {{ committedDate }}
+      ... on Tag {{
+        tagger {{ date }}
+        target {{ ... on Commit {{ committedDate }} }}
+      }}
+    }}"""
+
+# Go pseudo-versions carry the UTC commit time and the 12 character revision prefix:
+# vX.0.0-yyyymmddhhmmss-abcdefabcdef, vX.Y.Z-pre.0.yyyymmddhhmmss-abcdefabcdef
+# and vX.Y.Z-0.yyyymmddhhmmss-abcdefabcdef, each optionally suffixed by +incompatible.
+# Any other shape is a regular tag and has to be looked up.
+PSEUDO_VERSION_REGEX = re.compile(
+    r'^v\d+\.(?:0\.0-|\d+\.\d+-(?:[^+]*\.)?0\.)(\d{14})-([0-9a-f]{12})(?:\+incompatible)?$')
+
+
+def parse_pseudo_version(version):
+    """Extract the commit date and revision from a Go pseudo-version.
+
+    :param version: str, version such as v0.0.0-20200917131913-abcdef123456
+    :return: tuple (date in %Y-%m-%dT%H:%M:%SZ format, revision), None if not a pseudo-version
+    """
+    match = PSEUDO_VERSION_REGEX.match(version or '')
+    if not match:
+        return None
+    timestamp, revision = match.groups()
+    try:
+        date = datetime.strptime(timestamp, '%Y%m%d%H%M%S')
+    except ValueError:
+        return None
+    return date.strftime('%Y-%m-%dT%H:%M:%SZ'), revision
+
+
+def get_github_tokens():
+    """Return the list of gh tokens configured by the GITHUB_TOKEN environment variable."""
+    tokens = environ.get('GITHUB_TOKEN', "")
+    if not tokens:
+        tokens = base64.b64decode(msg.encode('ascii')).decode('ascii')
+    return tokens.split(",")
+
+
+def get_cached_tag_shas(org, name):
+    """Return the cached {tag: sha} map of a repository, None if missing or expired."""
+    with _tag_cache_lock:
+        cached = _tag_cache.get((org.lower(), name.lower()))
+    if cached and cached[0] > time.time():
+        return cached[1]
+    return None
+
+
+def cache_tag_shas(org, name, tags):
+    """Cache the {tag: sha} map of a repository for GITHUB_TAG_CACHE_TTL seconds."""
+    with _tag_cache_lock:
+        _tag_cache[(org.lower(), name.lower())] = (time.time() + GITHUB_TAG_CACHE_TTL, tags)
+
+
+def is_valid_input(*values):
+    """Return True if all the values are given, log an error otherwise."""
+    if all(values):
+        return True
+    _logger.error("Input data is not valid. {}".format(values))
+    return False
+
+
+def tag_ref_url(api, org, name, version):
+    """Return the api url of the git ref of a tag."""
+    return api + "repos/{o}/{n}/git/refs/tags/{v}".format(o=org, n=name, v=version)
+
+
+def tag_listing_url(api, org, name, page):
+    """Return the api url of a page of the git refs of all the tags."""
+    return api + "repos/{o}/{n}/git/matching-refs/tags?per_page={s}&page={p}".format(
+        o=org, n=name, s=TAGS_PAGE_SIZE, p=page)
+
+
+def commit_url(api, org, name, sha):
+    """Return the api url of a commit."""
+    return api + "repos/{o}/{n}/commits/{s}".format(o=org, n=name, s=sha)
+
+
+def tag_url(api, org, name, sha):
+    """Return the api url of an annotated tag object."""
+    return api + "repos/{o}/{n}/git/tags/{s}".format(o=org, n=name, s=sha)
+
+
+def parse_ref_sha(data):
+    """Return the sha a git ref points to."""
+    return data.get('object', {}).get('sha', '')
+
+
+def add_tag_listing_page(tags, data):
+    """Add a page of tag refs to the {tag: sha} map, return True if another page may follow.
+
+    Listing stops on a short page, and on a page without new tags, in case the
+    page parameter is ignored and the same refs come back every time.
+    """
+    count = len(tags)
+    for ref in data:
+        tags[ref.get('ref', '')[len('refs/tags/'):]] = parse_ref_sha(ref)
+    return len(data) >= TAGS_PAGE_SIZE and len(tags) > count
+
+
+def parse_commit_date(data):
+    """Return the committer date of a commit, None if the response holds no commit."""
+    commit = data.get('commit', {})
+    if not commit:
+        return None
+    return commit.get('committer', {}).get('date', '')
+
+
+def parse_tag_date(data):
+    """Return the tagger date of an annotated tag."""
+    return data.get('tagger', {}).get('date', '')
+
+
+def get_date_from_pseudo_version(version):
+    """Return the commit date encoded in a Go pseudo-version, without any api call."""
+    pseudo_version = parse_pseudo_version(version)
+    if not pseudo_version:
+        return None
+    return pseudo_version[0]
+
+
+def get_cached_date(cache, org, name, sha, kind):
+    """Return the date of a commit or tag sha from the CommitDateCache, None if unknown."""
+    if cache and cache.is_cacheable(sha):
+        return cache.get(org, name, sha, kind)
+    return None
+
+
+def set_cached_date(cache, org, name, sha, kind, date):
+    """Cache the date of a commit or tag sha, dates of full shas never change."""
+    if date and cache and cache.is_cacheable(sha):
+        cache.set(org, name, sha, kind, date)
+
+
+def is_date_in_vuln_range(date, date_range_rules):
+    """Return True if the date in %Y-%m-%dT%H:%M:%SZ format lies within the date range rules."""
+    date = datetime.strptime(date, '%Y-%m-%dT%H:%M:%SZ')
+    return date in compile_date_rule(date_range_rules)
+
+
+def is_commit_date_in_vuln_range(date_string, date_range_rules):
+    """Return True if the date in yyyymmddhhmmss format lies within the date range rules.
+
+    None is returned when the date is not valid.
+    """
+    try:
+        comm_date = datetime.strptime(date_string, '%Y%m%d%H%M%S')
+    except ValueError:
+        _logger.error("Date format is wrong. Follow yyyymmddhhmmss format")
+        return None
+    return comm_date in compile_date_rule(date_range_rules)
+
+
+def _to_utc_date_string(date_string):
+    """Normalize an ISO-8601 timestamp with offset to the %Y-%m-%dT%H:%M:%SZ format."""
+    if not date_string or date_string.endswith('Z'):
+        return date_string
+    # strptime %z doesn't accept a colon inside the offset on python 3.6
+    if date_string[-3] == ':':
+        date_string = date_string[:-3] + date_string[-2:]
+    date = datetime.strptime(date_string, '%Y-%m-%dT%H:%M:%S%z')
+    return date.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
 
 class GithubUtils:
     """Github utils class."""
 
-    def __init__(self):
-        """Init method for GithubUtils class."""
-        self.GITHUB_TOKEN = environ.get('GITHUB_TOKEN', "")
+    def __init__(self, use_tag_listing=False):
+        """Init method for GithubUtils class.
+
+        :param use_tag_listing: bool, resolve versions from a cached listing of all the
+                                tags of the repository instead of one api call per version
+        """
+        self.use_tag_listing = use_tag_listing
+        self.GITHUB_TOKEN = get_github_tokens()
         self.GITHUB_API = "https://api.github.com/"
-        base64_bytes = msg.encode('ascii')
-        msg_bytes = base64.b64decode(base64_bytes)
-        message = msg_bytes.decode('ascii')
-        if not self.GITHUB_TOKEN:
-            self.GITHUB_TOKEN = message
-        self.GITHUB_TOKEN = self.GITHUB_TOKEN.split(",")
-
-    def __select_gh_token(self):
-        """Randomly select and return a gh token."""
-        if len(self.GITHUB_TOKEN) > 0:
-            return random.choice(self.GITHUB_TOKEN)
-        _logger.info("Could not select a gh token.")
-        return None
+        self.GITHUB_GRAPHQL_API = self.GITHUB_API + "graphql"
+        self.token_pool = get_token_pool(self.GITHUB_TOKEN)
+        self.http_cache = get_conditional_request_cache(GITHUB_HTTP_CACHE_PATH)
+        self.retry_policy = DEFAULT_RETRY_POLICY
+        self.commit_date_cache = None
+        if GITHUB_COMMIT_DATE_CACHE_PATH:
+            self.commit_date_cache = CommitDateCache(GITHUB_COMMIT_DATE_CACHE_PATH)
 
-    def __make_get_call(self, url):
-        """Make an api call and return results."""
+    def __select_gh_token(self, resource='core'):
+        """Select and return the gh token with the most remaining rate limit."""
+        return self.token_pool.select(resource)
+
+    def get_token_stats(self):
+        """Return the rate limit quota known for each gh token."""
+        return self.token_pool.stats()
+
+    def get_http_cache_stats(self):
+        """Return the hit, miss and 304 counters of the conditional request cache."""
+        return self.http_cache.stats()
+
+    def __get(self, url, headers):
+        """Make a GET api call with the given headers and return the response."""
         token = self.__select_gh_token()
+        if token:
+            headers['Authorization'] = 'token {t}'.format(t=token)
+        response = self.retry_policy.get(url, headers=headers or None)
+        self.token_pool.update(token, response.headers, response.status_code)
+        return response
+
+    def __make_get_call(self, url):
+        """Make a conditional api call and return results."""
+        response = self.__get(url, self.http_cache.validators(url))
+        if response.status_code == 304:
+            data = self.http_cache.get_not_modified(url)
+            if data is not None:
+                return data
+            # the cached body is gone, e.g. evicted meanwhile, ask again unconditionally
+            response = self.__get(url, {})
+        if response.status_code != 200:
+            _logger.error(
+                'Unable to fetch details for package {u}'.format(u=url)
+            )
+            _logger.error("Error Code: {}".format(response.status_code))
+            return None
+        self.http_cache.store(url, response.headers, response.text)
+        return response.json()
+
+    def __make_post_call(self, url, payload):
+        """Make a POST api call and return results."""
+        token = self.__select_gh_token('graphql')
         headers = None
         if token:
             headers = {
                 'Authorization': 'token {t}'.format(t=token)
             }
-        response = requests.get(url, headers=headers)
+        response = self.retry_policy.post(url, json=payload, headers=headers)
+        self.token_pool.update(token, response.headers, response.status_code)
         if response.status_code != 200:
             _logger.error(
-                'Unable to fetch details for package {u}'.format(u=url)
+                'Unable to fetch details for the url {u}'.format(u=url)
             )
             _logger.error("Error Code: {}".format(response.status_code))
             return None
@@ -70,63 +292,77 @@ class GithubUtils:
 
     def _get_hash_from_semver(self, org, name, version):
         """Return the commit hash from the semver."""
-        try:
-            assert org
-            assert name
-            assert version
-        except AssertionError as e:
-            _logger.error("Input data is not valid. {}".format(e))
+        if not is_valid_input(org, name, version):
             return None
-        url = self.GITHUB_API + "repos/{o}/{n}/git/refs/tags/{v}".format(
-            o=org, n=name, v=version)
+        if self.use_tag_listing:
+            tags = self._get_tag_shas(org, name)
+            sha = (tags or {}).get(version)
+            if sha:
+                return sha
+            if tags is not None:
+                # the tag may have been pushed after the listing was cached
+                _logger.info("No tag {v} listed for {o}/{n}".format(v=version, o=org, n=name))
+        url = tag_ref_url(self.GITHUB_API, org, name, version)
 
         data = self.__make_get_call(url)
         if not data:
             _logger.info("No commit hash found for the url {}".format(url))
             return None
-        sha = data.get('object', {}).get('sha', '')
-        return sha
+        return parse_ref_sha(data)
+
+    def _get_tag_shas(self, org, name):
+        """Return the {tag: sha} map of all the tags of a repository, cached for a TTL."""
+        tags = get_cached_tag_shas(org, name)
+        if tags is not None:
+            return tags
+
+        tags = {}
+        page = 1
+        while True:
+            data = self.__make_get_call(tag_listing_url(self.GITHUB_API, org, name, page))
+            if data is None:
+                # an incomplete listing must not be cached
+                _logger.info("Unable to list the tags of {o}/{n}".format(o=org, n=name))
+                return None
+            if not add_tag_listing_page(tags, data):
+                break
+            page += 1
+
+        cache_tag_shas(org, name, tags)
+        return tags
 
     def _get_date_from_commit_sha(self, org, name, sha):
         """Return the commit date for the commit hash."""
-        try:
-            assert org
-            assert name
-            assert sha
-        except AssertionError as e:
-            _logger.error("Input data is not valid. {}".format(e))
+        if not is_valid_input(org, name, sha):
             return None
-        url = self.GITHUB_API + "repos/{o}/{n}/commits/{s}".format(
-            o=org, n=name, s=sha)
+        date = get_cached_date(self.commit_date_cache, org, name, sha, 'commit')
+        if date:
+            return date
+        url = commit_url(self.GITHUB_API, org, name, sha)
 
         data = self.__make_get_call(url)
         if not data:
             _logger.info("No details found for the url {}".format(url))
             return None
-        commit = data.get('commit', {})
-        if commit:
-            date = commit.get('committer', {}).get('date', '')
-        else:
-            date = None
+        date = parse_commit_date(data)
+        set_cached_date(self.commit_date_cache, org, name, sha, 'commit', date)
         return date
 
     def _get_date_from_tag_sha(self, org, name, sha):
         """Return the commit tag date for the tag hash."""
-        try:
-            assert org
-            assert name
-            assert sha
-        except AssertionError as e:
-            _logger.error("Input data is not valid. {}".format(e))
+        if not is_valid_input(org, name, sha):
             return None
+        date = get_cached_date(self.commit_date_cache, org, name, sha, 'tag')
+        if date:
+            return date
 
-        url = self.GITHUB_API + "repos/{o}/{n}/git/tags/{s}".format(
-            o=org, n=name, s=sha)
+        url = tag_url(self.GITHUB_API, org, name, sha)
         data = self.__make_get_call(url)
         if not data:
             _logger.info("No details found for the url {}".format(url))
             return None
-        date = data.get('tagger', {}).get('date', '')
+        date = parse_tag_date(data)
+        set_cached_date(self.commit_date_cache, org, name, sha, 'tag', date)
         return date
 
     def _get_date_from_semver(self, org, name, version):
@@ -140,8 +376,13 @@ class GithubUtils:
             dt = self._get_date_from_tag_sha(org, name, tag_sha)
         return dt
 
+    _get_date_from_pseudo_version = staticmethod(get_date_from_pseudo_version)
+
     def _get_commit_date(self, org, name, commit_data):
         """Get the commit date details from the tag or hash."""
+        dt = self._get_date_from_pseudo_version(commit_data)
+        if dt:
+            return dt
         if len(commit_data) == 40:
             # chances are that its a commit hash
             dt = self._get_date_from_commit_sha(org, name, commit_data)
@@ -152,36 +393,88 @@ class GithubUtils:
         dt = self._get_date_from_semver(org, name, commit_data)
         return dt
 
-    def __check_for_date_rule(self, comm_date, date_rule):
-        """Check if the committed date falls in the date rule."""
-        if date_rule == "*":
-            return True
-        if '&' in date_rule:
-            date_rules_splitted = date_rule.split('&')
-            return self.__check_for_date_rule(comm_date, date_rules_splitted[0]) and \
-                self.__check_for_date_rule(comm_date, date_rules_splitted[1])
-        operator = date_rule.split('#')[0]
-        operand = datetime.strptime(date_rule.split('#')[1], '%Y-%m-%dT%H:%M:%SZ')
-        if operator == "<":
-            return comm_date < operand
-        elif operator == "<=":
-            return comm_date <= operand
-        elif operator == ">":
-            return comm_date > operand
-        elif operator == ">=":
-            return comm_date >= operand
-        elif operator == "=":
-            return comm_date == operand
-        else:
-            return False
+    @staticmethod
+    def __build_graphql_query(items):
+        """Build an aliased GraphQL query and its variables for the (org, name, ref) items."""
+        declarations = []
+        selections = []
+        variables = {}
+        for i, (org, name, commit_data) in enumerate(items):
+            if len(commit_data) == 40:
+                expression = commit_data
+            else:
+                expression = "refs/tags/" + commit_data
+            declarations.append("$o{i}: String!, $n{i}: String!, $e{i}: String!".format(i=i))
+            selections.append(
+                "  r{i}: repository(owner: $o{i}, name: $n{i}) {{{fields}\n  }}".format(
+                    i=i, fields=GRAPHQL_OBJECT_FIELDS.format(i=i)))
+            variables.update({"o{}".format(i): org,
+                              "n{}".format(i): name,
+                              "e{}".format(i): expression})
+        query = "query({d}) {{\n{s}\n}}".format(
+            d=", ".join(declarations), s="\n".join(selections))
+        return query, variables
+
+    @staticmethod
+    def __get_date_from_graphql_object(obj):
+        """Return the commit date of a GraphQL Commit or Tag object."""
+        if not obj:
+            return None
+        date = obj.get('committedDate')
+        if not date:
+            # annotated tag, prefer the date of the commit it points to
+            date = (obj.get('target') or {}).get('committedDate') or \
+                (obj.get('tagger') or {}).get('date')
+        return _to_utc_date_string(date)
+
+    def _get_commit_dates(self, items, rest_fallback=True):
+        """Get the commit dates for many tags or hashes in a few GraphQL calls.
+
+        :param items: iterable of (org, name, tag or hash) tuples
+        :param rest_fallback: bool, resolve items missing from GraphQL results via REST calls
+        :return: dict mapping every (org, name, tag or hash) tuple to its date or None
+        """
+        dates = {}
+        pending = []
+        for item in items:
+            if item in dates:
+                continue
+            org, name, commit_data = item
+            if not (org and name and commit_data):
+                _logger.error("Input data is not valid. {}".format(item))
+                dates[item] = None
+                continue
+            dates[item] = self._get_date_from_pseudo_version(commit_data)
+            if not dates[item]:
+                pending.append(item)
+
+        for start in range(0, len(pending), GRAPHQL_BATCH_SIZE):
+            batch = pending[start:start + GRAPHQL_BATCH_SIZE]
+            query, variables = self.__build_graphql_query(batch)
+            data = self.__make_post_call(self.GITHUB_GRAPHQL_API,
+                                         {"query": query, "variables": variables})
+            repositories = (data or {}).get('data') or {}
+            for i, item in enumerate(batch):
+                repository = repositories.get("r{}".format(i)) or {}
+                dates[item] = self.__get_date_from_graphql_object(repository.get('object'))
+
+        if rest_fallback:
+            for item in pending:
+                if not dates[item]:
+                    dates[item] = self._get_commit_date(*item)
+        return dates
 
     def _is_commit_in_vuln_range(self, org, name, sha, date_range_rules):
         """Return True or False if the date of commit sha lies within the vuln date range rules."""
         """
         rules can be provided in the following format:
-        >#2020-09-17T13:19:13Z,>=#2020-09-17T13:19:13Z&<2020-09-20T13:19:13Z and so on.
+        >#2020-09-17T13:19:13Z,>=#2020-09-17T13:19:13Z&<2020-09-20T13:19:13Z and so on,
+        or as a DateRangeRule from compile_date_rule.
+        sha can also be a Go pseudo-version, in which case no api call is made.
         """
-        comm_date = self._get_date_from_commit_sha(org, name, sha)
+        comm_date = self._get_date_from_pseudo_version(sha)
+        if not comm_date:
+            comm_date = self._get_date_from_commit_sha(org, name, sha)
         if not comm_date:
             comm_date = self._get_date_from_tag_sha(org, name, sha)
         if not comm_date:
@@ -189,35 +482,27 @@ class GithubUtils:
                 h=sha, o=org, n=name
             ))
             return None
-        comm_date = datetime.strptime(comm_date, '%Y-%m-%dT%H:%M:%SZ')
-        if ',' in date_range_rules:
-            rules = date_range_rules.split(',')
-            for rule in rules:
-                val = self.__check_for_date_rule(comm_date, rule)
-                if val:
-                    return True
-            return False
-        else:
-            return self.__check_for_date_rule(comm_date, date_range_rules)
+        return is_date_in_vuln_range(comm_date, date_range_rules)
 
     def _is_commit_date_in_vuln_range(self, date_string, date_range_rules):
         """Return True or False if the date of commit sha lies within the date range rules."""
         """
         rules can be provided in the following format:
-        >#2020-09-17T13:19:13Z,>=#2020-09-17T13:19:13Z&<2020-09-20T13:19:13Z and so on.
+        >#2020-09-17T13:19:13Z,>=#2020-09-17T13:19:13Z&<2020-09-20T13:19:13Z and so on,
+        or as a DateRangeRule from compile_date_rule.
         date in yyyymmddhhmmss format.
         """
-        try:
-            comm_date = datetime.strptime(date_string, '%Y%m%d%H%M%S')
-        except ValueError:
-            _logger.error("Date format is wrong. Follow yyyymmddhhmmss format")
-            return None
-        if ',' in date_range_rules:
-            rules = date_range_rules.split(',')
-            for rule in rules:
-                val = self.__check_for_date_rule(comm_date, rule)
-                if val:
-                    return True
-            return False
-        else:
-            return self.__check_for_date_rule(comm_date, date_range_rules)
+        return is_commit_date_in_vuln_range(date_string, date_range_rules)
+
+    def _are_commit_dates_in_vuln_ranges(self, date_strings, date_range_rules_list):
+        """Return a matrix telling which dates lie within which date range rules.
+
+        dates in yyyymmddhhmmss format, rules as for _is_commit_date_in_vuln_range.
+        Row i holds a bool per rule for date i, or None when date i is not valid.
+        """
+        matrix = evaluate_date_rules(date_strings, date_range_rules_list)
+        invalid = sum(1 for row in matrix if row is None)
+        if invalid:
+            _logger.error("Date format is wrong for {} dates. Follow yyyymmddhhmmss format".format(
+                invalid))
+        return matrix
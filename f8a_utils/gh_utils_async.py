@@ -0,0 +1,270 @@
+"""Asyncio counterpart of the utility file to fetch github details.
+
+Needs aiohttp, installed with the async extra: pip install f8a-utils[async].
+"""
+
+import json
+import asyncio
+import logging
+from collections import namedtuple
+
+import aiohttp
+
+from f8a_utils.default_config import GITHUB_COMMIT_DATE_CACHE_PATH, GITHUB_HTTP_CACHE_PATH, \
+    GITHUB_MAX_CONCURRENCY
+from f8a_utils.gh_cache import CommitDateCache, get_conditional_request_cache
+from f8a_utils.gh_token_pool import get_token_pool
+from f8a_utils.retry_policy import DEFAULT_RETRY_POLICY
+from f8a_utils.gh_utils import get_github_tokens, get_cached_tag_shas, \
+    cache_tag_shas, is_valid_input, tag_ref_url, tag_listing_url, commit_url, tag_url, \
+    parse_ref_sha, add_tag_listing_page, parse_commit_date, parse_tag_date, \
+    get_date_from_pseudo_version, get_cached_date, set_cached_date, is_date_in_vuln_range, \
+    is_commit_date_in_vuln_range
+
+_logger = logging.getLogger(__name__)
+
+# Errors of a request worth another attempt, besides those retried for requests.
+RETRYABLE_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+_Response = namedtuple('_Response', 'status_code headers text')
+
+
+class AsyncGithubUtils:
+    """Github utils class for asyncio, with the methods of GithubUtils as coroutines.
+
+    Requests share one pooled aiohttp session limited to max_concurrency connections,
+    they are retried and time out by the retry_policy like those of GithubUtils.
+    Use it as an async context manager, or call close() when done.
+    """
+
+    def __init__(self, use_tag_listing=False, max_concurrency=GITHUB_MAX_CONCURRENCY,
+                 api_url="https://api.github.com/"):
+        """Init method for AsyncGithubUtils class.
+
+        :param use_tag_listing: bool, resolve versions from a cached listing of all the
+                                tags of the repository instead of one api call per version
+        :param max_concurrency: int, maximum number of requests in flight
+        :param api_url: str, base url of the GitHub api
+        """
+        self.use_tag_listing = use_tag_listing
+        self.max_concurrency = max_concurrency
+        self.GITHUB_TOKEN = get_github_tokens()
+        self.GITHUB_API = api_url
+        self.token_pool = get_token_pool(self.GITHUB_TOKEN)
+        self.http_cache = get_conditional_request_cache(GITHUB_HTTP_CACHE_PATH)
+        self.retry_policy = DEFAULT_RETRY_POLICY
+        self.commit_date_cache = None
+        if GITHUB_COMMIT_DATE_CACHE_PATH:
+            self.commit_date_cache = CommitDateCache(GITHUB_COMMIT_DATE_CACHE_PATH)
+        self._session = None
+
+    async def __aenter__(self):
+        """Enter the async context."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close the session when leaving the async context."""
+        await self.close()
+
+    async def close(self):
+        """Close the pooled http session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def __get_session(self):
+        """Return the pooled http session, created within the running event loop."""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def get_token_stats(self):
+        """Return the rate limit quota known for each gh token."""
+        return self.token_pool.stats()
+
+    def get_http_cache_stats(self):
+        """Return the hit, miss and 304 counters of the conditional request cache."""
+        return self.http_cache.stats()
+
+    async def __blocking(self, func, *args):
+        """Run a blocking call, e.g. of a SQLite cache, in the default executor."""
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    async def __get(self, url, headers):
+        """Make a GET api call with the given headers, return the status code, headers and body."""
+        token = self.token_pool.select()
+        if token:
+            headers['Authorization'] = 'token {t}'.format(t=token)
+
+        async def attempt(timeout):
+            async with self.__get_session().get(
+                    url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                text = await response.text() if response.status == 200 else None
+                return _Response(response.status, response.headers, text)
+
+        response = await self.retry_policy.run_async(attempt, RETRYABLE_ERRORS)
+        self.token_pool.update(token, response.headers, response.status_code)
+        return response
+
+    async def __make_get_call(self, url):
+        """Make a conditional api call and return results."""
+        response = await self.__get(url, await self.__blocking(self.http_cache.validators, url))
+        if response.status_code == 304:
+            data = await self.__blocking(self.http_cache.get_not_modified, url)
+            if data is not None:
+                return data
+            # the cached body is gone, e.g. evicted meanwhile, ask again unconditionally
+            response = await self.__get(url, {})
+        if response.status_code != 200:
+            _logger.error(
+                'Unable to fetch details for package {u}'.format(u=url)
+            )
+            _logger.error("Error Code: {}".format(response.status_code))
+            return None
+        await self.__blocking(self.http_cache.store, url, response.headers, response.text)
+        return json.loads(response.text)
+
+    async def __get_cached_date(self, org, name, sha, kind):
+        """Return the permanently cached date of a commit or tag sha."""
+        if self.commit_date_cache is None:
+            return None
+        return await self.__blocking(get_cached_date, self.commit_date_cache,
+                                     org, name, sha, kind)
+
+    async def __set_cached_date(self, org, name, sha, kind, date):
+        """Cache the date of a commit or tag sha."""
+        if self.commit_date_cache is not None:
+            await self.__blocking(set_cached_date, self.commit_date_cache,
+                                  org, name, sha, kind, date)
+
+    async def _get_hash_from_semver(self, org, name, version):
+        """Return the commit hash from the semver."""
+        if not is_valid_input(org, name, version):
+            return None
+        if self.use_tag_listing:
+            tags = await self._get_tag_shas(org, name)
+            sha = (tags or {}).get(version)
+            if sha:
+                return sha
+            if tags is not None:
+                # the tag may have been pushed after the listing was cached
+                _logger.info("No tag {v} listed for {o}/{n}".format(v=version, o=org, n=name))
+        url = tag_ref_url(self.GITHUB_API, org, name, version)
+
+        data = await self.__make_get_call(url)
+        if not data:
+            _logger.info("No commit hash found for the url {}".format(url))
+            return None
+        return parse_ref_sha(data)
+
+    async def _get_tag_shas(self, org, name):
+        """Return the {tag: sha} map of all the tags of a repository, cached for a TTL."""
+        tags = get_cached_tag_shas(org, name)
+        if tags is not None:
+            return tags
+
+        tags = {}
+        page = 1
+        while True:
+            data = await self.__make_get_call(tag_listing_url(self.GITHUB_API, org, name, page))
+            if data is None:
+                # an incomplete listing must not be cached
+                _logger.info("Unable to list the tags of {o}/{n}".format(o=org, n=name))
+                return None
+            if not add_tag_listing_page(tags, data):
+                break
+            page += 1
+
+        cache_tag_shas(org, name, tags)
+        return tags
+
+    async def _get_date_from_commit_sha(self, org, name, sha):
+        """Return the commit date for the commit hash."""
+        if not is_valid_input(org, name, sha):
+            return None
+        date = await self.__get_cached_date(org, name, sha, 'commit')
+        if date:
+            return date
+        url = commit_url(self.GITHUB_API, org, name, sha)
+
+        data = await self.__make_get_call(url)
+        if not data:
+            _logger.info("No details found for the url {}".format(url))
+            return None
+        date = parse_commit_date(data)
+        await self.__set_cached_date(org, name, sha, 'commit', date)
+        return date
+
+    async def _get_date_from_tag_sha(self, org, name, sha):
+        """Return the commit tag date for the tag hash."""
+        if not is_valid_input(org, name, sha):
+            return None
+        date = await self.__get_cached_date(org, name, sha, 'tag')
+        if date:
+            return date
+
+        url = tag_url(self.GITHUB_API, org, name, sha)
+        data = await self.__make_get_call(url)
+        if not data:
+            _logger.info("No details found for the url {}".format(url))
+            return None
+        date = parse_tag_date(data)
+        await self.__set_cached_date(org, name, sha, 'tag', date)
+        return date
+
+    async def _get_date_from_semver(self, org, name, version):
+        """Get the commit date from the version."""
+        tag_sha = await self._get_hash_from_semver(org, name, version)
+        if not tag_sha:
+            _logger.info("Not able to fetch details for the version.")
+            return None
+        dt = await self._get_date_from_commit_sha(org, name, tag_sha)
+        if not dt:
+            dt = await self._get_date_from_tag_sha(org, name, tag_sha)
+        return dt
+
+    _get_date_from_pseudo_version = staticmethod(get_date_from_pseudo_version)
+
+    async def _get_commit_date(self, org, name, commit_data):
+        """Get the commit date details from the tag or hash."""
+        dt = self._get_date_from_pseudo_version(commit_data)
+        if dt:
+            return dt
+        if len(commit_data) == 40:
+            # chances are that its a commit hash
+            dt = await self._get_date_from_commit_sha(org, name, commit_data)
+            if not dt:
+                dt = await self._get_date_from_tag_sha(org, name, commit_data)
+            if dt:
+                return dt
+        return await self._get_date_from_semver(org, name, commit_data)
+
+    async def _get_commit_dates(self, items):
+        """Get the commit dates for many tags or hashes concurrently.
+
+        :param items: iterable of (org, name, tag or hash) tuples
+        :return: dict mapping every (org, name, tag or hash) tuple to its date or None
+        """
+        items = list(dict.fromkeys(items))
+        dates = await asyncio.gather(*(self._get_commit_date(*item) for item in items))
+        return dict(zip(items, dates))
+
+    async def _is_commit_in_vuln_range(self, org, name, sha, date_range_rules):
+        """Return True or False if the date of commit sha lies within the vuln date range rules.
+
+        Rules as for GithubUtils._is_commit_in_vuln_range.
+        """
+        comm_date = self._get_date_from_pseudo_version(sha)
+        if not comm_date:
+            comm_date = await self._get_date_from_commit_sha(org, name, sha)
+        if not comm_date:
+            comm_date = await self._get_date_from_tag_sha(org, name, sha)
+        if not comm_date:
+            _logger.info("No info on the commit hash {h} for {o}/{n} found.".format(
+                h=sha, o=org, n=name
+            ))
+            return None
+        return is_date_in_vuln_range(comm_date, date_range_rules)
+
+    _is_commit_date_in_vuln_range = staticmethod(is_commit_date_in_vuln_range)
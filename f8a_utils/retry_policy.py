@@ -0,0 +1,129 @@
+"""Deadline bounded retries of outbound HTTP calls."""
+
+import time
+import socket
+import logging
+
+from f8a_utils.default_config import OUTBOUND_CALL_BUDGET, OUTBOUND_CALL_MAX_ATTEMPTS
+
+_logger = logging.getLogger(__name__)
+
+# Responses worth another attempt, everything else is returned to the caller as is.
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def _is_retryable_error(error):
+    """Return True for connection problems and timeouts, False for definitive answers."""
+    import requests
+    from urllib.error import URLError, HTTPError
+
+    if isinstance(error, HTTPError):
+        return error.code in RETRY_STATUS_CODES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout,
+                              URLError, socket.timeout, ConnectionError))
+
+
+class RetryPolicy:
+    """Retry outbound calls with exponential backoff within a total latency budget.
+
+    Every attempt gets the remaining budget as its timeout, and no retry is made
+    once waiting for it would exceed the budget, so a call never takes much longer
+    than the budget no matter how the upstream behaves.
+    """
+
+    def __init__(self, budget=OUTBOUND_CALL_BUDGET, max_attempts=OUTBOUND_CALL_MAX_ATTEMPTS,
+                 min_wait=0.5, max_wait=8):
+        """Create a policy, it holds no state and can be shared by concurrent calls.
+
+        :param budget: float, total seconds a call may take including retries
+        :param max_attempts: int, maximum number of attempts
+        :param min_wait: float, seconds to wait before the first retry, doubled for every next
+        :param max_wait: float, maximum seconds to wait between attempts
+        """
+        self.budget = budget
+        self.max_attempts = max_attempts
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+
+    def get(self, url, **kwargs):
+        """Make a GET call with requests and return the last response."""
+        import requests
+
+        return self._run(lambda timeout: requests.get(url, timeout=timeout, **kwargs))
+
+    def post(self, url, **kwargs):
+        """Make a POST call with requests and return the last response."""
+        import requests
+
+        return self._run(lambda timeout: requests.post(url, timeout=timeout, **kwargs))
+
+    def urlopen(self, url):
+        """Open the url with urllib, retrying HTTPErrors with a retryable status only."""
+        import urllib.request
+
+        return self._run(lambda timeout: urllib.request.urlopen(url, timeout=timeout))
+
+    async def run_async(self, attempt, retryable_errors=()):
+        """Await attempt(timeout) with the same retries as the synchronous calls.
+
+        :param attempt: coroutine function taking the timeout of the attempt in seconds,
+                        returning a response with a status_code
+        :param retryable_errors: tuple, further exception types to retry, e.g. of aiohttp
+        """
+        import tenacity
+
+        deadline = time.monotonic() + self.budget
+        retrying = tenacity.AsyncRetrying(**self._retrying_arguments(deadline, retryable_errors))
+
+        # a coroutine function, tenacity doesn't await what a plain lambda returns
+        async def attempt_with_timeout():
+            return await attempt(self._remaining(deadline))
+
+        return await retrying(attempt_with_timeout)
+
+    def _run(self, attempt):
+        """Run attempt(timeout) until it succeeds, the attempts or the budget are spent."""
+        import tenacity
+
+        deadline = time.monotonic() + self.budget
+        retrying = tenacity.Retrying(**self._retrying_arguments(deadline))
+        return retrying(lambda: attempt(self._remaining(deadline)))
+
+    @staticmethod
+    def _remaining(deadline):
+        """Return the timeout of the next attempt, the rest of the budget."""
+        return max(deadline - time.monotonic(), 0.001)
+
+    def _retrying_arguments(self, deadline, retryable_errors=()):
+        """Return the tenacity arguments retrying attempts until the deadline."""
+        import tenacity
+
+        wait = tenacity.wait_exponential(multiplier=self.min_wait, min=self.min_wait,
+                                         max=self.max_wait)
+
+        def stop(retry_state):
+            if retry_state.attempt_number >= self.max_attempts:
+                return True
+            return time.monotonic() + wait(retry_state) >= deadline
+
+        def is_retryable(error):
+            return isinstance(error, retryable_errors) or _is_retryable_error(error)
+
+        def log_retry(retry_state):
+            _logger.warning('Retrying outbound call after attempt {n}'.format(
+                n=retry_state.attempt_number))
+
+        return {
+            'stop': stop,
+            'wait': wait,
+            'retry': tenacity.retry_any(
+                tenacity.retry_if_exception(is_retryable),
+                tenacity.retry_if_result(
+                    lambda r: getattr(r, 'status_code', None) in RETRY_STATUS_CODES)),
+            'before_sleep': log_retry,
+            # hand out the last response or raise the last error once we give up
+            'retry_error_callback': lambda retry_state: retry_state.outcome.result()
+        }
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
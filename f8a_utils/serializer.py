@@ -0,0 +1,102 @@
+"""Compact JSON serialization of dependency finder results.
+
+orjson is used when it is installed, pip install f8a-utils[fast-json], the json
+module of the standard library otherwise. Both produce the same compact output.
+"""
+
+import io
+import json
+from functools import lru_cache
+
+# Containers nested up to this depth are encoded piece by piece by dump(), the ones
+# below as a whole. The default streams every entry of result/details/_resolved.
+STREAM_DEPTH = 6
+
+# Encoded pieces are collected up to this many characters or bytes before being written.
+WRITE_BUFFER_SIZE = 64 * 1024
+
+_json_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """Return the name of the JSON library in use, "orjson" or "json"."""
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return "json"
+    return "orjson"
+
+
+def _encoder(backend, binary):
+    """Return a function encoding an object to str or, if binary, to UTF-8 bytes."""
+    if (backend or get_backend()) == "orjson":
+        import orjson
+        if binary:
+            return orjson.dumps
+        return lambda obj: orjson.dumps(obj).decode()
+    if binary:
+        return lambda obj: _json_encoder.encode(obj).encode()
+    return _json_encoder.encode
+
+
+def dumps(obj, backend=None):
+    """Serialize obj to a compact JSON str.
+
+    :param obj: JSON serializable object
+    :param backend: str, "orjson" or "json" to force a backend, the fastest available one if None
+    """
+    return _encoder(backend, False)(obj)
+
+
+_TEXT_TOKENS = tuple('{}[]:,')
+_BINARY_TOKENS = tuple(token.encode() for token in _TEXT_TOKENS)
+
+
+def _iterencode(obj, encode, tokens, depth):
+    """Yield the JSON encoding of obj in pieces, encoding containers below depth whole."""
+    if depth <= 0 or not isinstance(obj, (dict, list, tuple)) or not obj:
+        yield encode(obj)
+        return
+    lbrace, rbrace, lbracket, rbracket, colon, comma = tokens
+    if isinstance(obj, dict):
+        yield lbrace
+        for i, (key, value) in enumerate(obj.items()):
+            if i:
+                yield comma
+            yield encode(str(key))
+            yield colon
+            yield from _iterencode(value, encode, tokens, depth - 1)
+        yield rbrace
+    else:
+        yield lbracket
+        for i, value in enumerate(obj):
+            if i:
+                yield comma
+            yield from _iterencode(value, encode, tokens, depth - 1)
+        yield rbracket
+
+
+def dump(obj, fp, backend=None, stream_depth=STREAM_DEPTH):
+    """Serialize obj as compact JSON to a file-like object, without building one big string.
+
+    :param obj: JSON serializable object
+    :param fp: file-like object, str is written to io.TextIOBase instances and bytes otherwise
+    :param backend: str, "orjson" or "json" to force a backend, the fastest available one if None
+    :param stream_depth: int, depth up to which containers are encoded piece by piece
+    """
+    binary = not isinstance(fp, io.TextIOBase)
+    encode = _encoder(backend, binary)
+    tokens = _BINARY_TOKENS if binary else _TEXT_TOKENS
+    empty = b'' if binary else ''
+    buffered = []
+    size = 0
+    for piece in _iterencode(obj, encode, tokens, stream_depth):
+        buffered.append(piece)
+        size += len(piece)
+        if size >= WRITE_BUFFER_SIZE:
+            fp.write(empty.join(buffered))
+            buffered = []
+            size = 0
+    if buffered:
+        fp.write(empty.join(buffered))
@@ -2,28 +2,132 @@
 
 import json
 from abc import ABC
-from collections import defaultdict
-import semver
+
+from f8a_utils.dependency_graph import DependencyGraph
+from f8a_utils.dependency_query import DependencyQuery
+
+
+def decode_content(data):
+    """Return manifest content as text.
+
+    Besides str and bytes, any buffer such as the memoryview or mmap stored by
+    ExternalCommand.run_binary() is accepted and decoded without an extra copy.
+    """
+    if isinstance(data, str):
+        return data
+    return str(data, "utf-8")
 
 
 class DependencyTreeGenerator(ABC):
     """Abstract class for Dependency Finderq."""
 
     @staticmethod
-    def get_dependencies(manifests, show_transitive):
+    def get_dependencies(manifests, show_transitive, normalized=False):
         """Make Ecosystem Tree."""
         pass
 
     @staticmethod
-    def _parse_transitives(*args):                # noqa
-        """func. for calculating transitives."""
+    def get_dependency_graph(content):
+        """Parse the manifest content into a DependencyGraph."""
         pass
 
+    def get_manifest_graph(self, content):
+        """Parse the manifest content given as str, bytes or a buffer into a DependencyGraph."""
+        return self.get_dependency_graph(decode_content(content))
+
+    def get_dependency_query(self, content):
+        """Return the DependencyQuery of the manifest content."""
+        graph = self.get_manifest_graph(content)
+        return DependencyQuery(graph, lambda node: self._to_json(graph, node),
+                               self._direct_dependencies(graph))
+
+    @staticmethod
+    def _to_json(graph, node):
+        """Return the dict of a node, with its package and version."""
+        pass
+
+    @staticmethod
+    def _direct_dependencies(graph):
+        """Return the ids of the direct dependencies."""
+        return graph.roots
+
+    @staticmethod
+    def _resolve_graph(graph, show_transitive, to_json, roots=None, transitive=None,
+                       normalized=False):
+        """Return the fields of the manifest details resolved from its graph.
+
+        By default this is _resolved, the list of the direct dependencies each with its
+        transitive deps. The normalized format lists every package once instead:
+        nodes is the table of packages, direct the indices of the direct dependencies
+        in it and edges the [from, to] index pairs of the dependencies between them.
+
+        :param graph: DependencyGraph of the manifest
+        :param show_transitive: bool, whether to list the transitive deps
+        :param to_json: callable returning the dict of a node id, called once per node
+        :param roots: list, ids of the direct dependencies, graph.roots by default
+        :param transitive: callable returning the ids of the transitive deps of a direct
+                           dependency, graph.closure by default
+        :param normalized: bool, whether to return the normalized format
+        """
+        roots = graph.roots if roots is None else roots
+        if normalized:
+            return DependencyTreeGenerator._normalize_graph(graph, show_transitive, to_json, roots)
+
+        parsed = {}
+
+        def node_json(node):
+            if node not in parsed:
+                parsed[node] = to_json(node)
+            return dict(parsed[node])
+
+        transitive = transitive or graph.closure
+        resolved = []
+        for root in roots:
+            direct = node_json(root)
+            direct["deps"] = [node_json(n) for n in transitive(root)] if show_transitive else []
+            resolved.append(direct)
+        return {"_resolved": resolved}
+
+    @staticmethod
+    def _normalize_graph(graph, show_transitive, to_json, roots):
+        """Return the nodes, direct and edges fields of the normalized format."""
+        index = {}
+        for root in roots:
+            index.setdefault(root, len(index))
+        edges = []
+        if show_transitive:
+            for root in roots:
+                for node in graph.closure(root):
+                    index.setdefault(node, len(index))
+            for node, i in index.items():
+                edges.extend([i, index[target]] for target in graph.successors(node)
+                             if target in index)
+        return {
+            "nodes": [to_json(node) for node in index],
+            "direct": [index[root] for root in roots],
+            "edges": edges
+        }
+
+    def get_dependencies_from_stream(self, lines, filepath, filename, show_transitive,
+                                     normalized=False):
+        """Make Ecosystem Tree from the manifest content given as an iterable of lines.
+
+        Generators whose format can be parsed line by line override this so the
+        content is never materialized, the rest join the lines into one manifest.
+        """
+        manifest = {
+            "filepath": filepath,
+            "filename": filename,
+            "content": "".join(lines)
+        }
+        return self.get_dependencies([manifest], show_transitive, normalized)
+
 
 class MavenDependencyTreeGenerator(DependencyTreeGenerator):
     """Generate Maven Dependency Tree."""
 
-    def get_dependencies(self, manifests: list, show_transitive: bool) -> dict:
+    def get_dependencies(self, manifests: list, show_transitive: bool,
+                         normalized: bool = False) -> dict:
         """Scan the maven dependencies files and fetch transitive deps."""
         deps = {}
         result = []
@@ -34,29 +138,8 @@ class MavenDependencyTreeGenerator(DependencyTreeGenerator):
                 "manifest_file_path": manifest['filepath'],
                 "manifest_file": manifest['filename']
             }
-            resolved = []
-            data = manifest['content']
-
-            if isinstance(data, bytes):
-                data = data.decode("utf-8")
-
-            tree = self._get_dependency_tree(data)
-            for direct, transitives in tree.items():
-                # Add meta data to generated tree.
-                parsed_json = self._parse_string(direct)
-                if parsed_json['scope'] == 'test':
-                    # Don't process Test Dependencies.
-                    continue
-                trans_list = []
-                if show_transitive:
-                    trans_list = self._parse_transitives(transitives)
-                tmp_json = {
-                    "package": parsed_json['groupId'] + ":" + parsed_json['artifactId'],
-                    "version": parsed_json['version'],
-                    "deps": trans_list
-                }
-                resolved.append(tmp_json)
-            dep['_resolved'] = resolved
+            graph = self.get_manifest_graph(manifest['content'])
+            dep.update(self._resolve(graph, show_transitive, normalized))
             details.append(dep)
             details_json = {"details": details}
             result.append(details_json)
@@ -64,49 +147,63 @@ class MavenDependencyTreeGenerator(DependencyTreeGenerator):
         deps['result'] = result
         return deps
 
-    def _parse_transitives(self, transitives: list) -> list:
-        """Scan the maven transitives."""
-        trans_list = []
-        for transitive in transitives:
-            parsed_json = self._parse_string(transitive)
-            tmp_json = {
-                "package": parsed_json['groupId'] + ":" + parsed_json['artifactId'],
-                "version": parsed_json['version']
-            }
-            trans_list.append(tmp_json)
-        return trans_list
+    def get_dependencies_from_stream(self, lines, filepath, filename, show_transitive,
+                                     normalized=False):
+        """Scan the maven dependencies read line by line, e.g. from a running command."""
+        dep = {
+            "ecosystem": "maven",
+            "manifest_file_path": filepath,
+            "manifest_file": filename
+        }
+        dep.update(self._resolve(self.get_dependency_graph(lines), show_transitive, normalized))
+        return {"result": [{"details": [dep]}]}
+
+    def _resolve(self, graph: DependencyGraph, show_transitive: bool,
+                 normalized: bool = False) -> dict:
+        """Add meta data to generated tree."""
+        return self._resolve_graph(graph, show_transitive, lambda node: self._to_json(graph, node),
+                                   roots=self._direct_dependencies(graph),
+                                   transitive=lambda node: graph.closure(node, reverse=True),
+                                   normalized=normalized)
+
+    def _direct_dependencies(self, graph: DependencyGraph) -> list:
+        """Return the ids of the direct dependencies."""
+        # Don't process Test Dependencies.
+        return [root for root in graph.roots
+                if self._parse_string(graph.keys[root])['scope'] != 'test']
+
+    def _to_json(self, graph: DependencyGraph, node: int) -> dict:
+        """Return the package and version of a node."""
+        parsed_json = self._parse_string(graph.keys[node])
+        return {
+            "package": parsed_json['groupId'] + ":" + parsed_json['artifactId'],
+            "version": parsed_json['version']
+        }
+
+    @staticmethod
+    def get_dependency_graph(content) -> DependencyGraph:
+        """Build Dependency Graph.
 
-    def _get_dependency_tree(self, content: str) -> dict:
-        """Build Dependency Tree.
+        Dependencies listed against a module are the roots, nodes are keyed by
+        their full coordinates.
 
-        :param content: file contents from dependency.txt
-        :return: Tree in format ({d1:[t1, t2]})
+        :param content: file contents from dependency.txt, or an iterable of its lines
+        :return: DependencyGraph
         """
-        final_map = {}
-        intermediate_map = defaultdict(list)
+        graph = DependencyGraph()
         module = ''
-        for line in content.split("\n"):
+        lines = content.split("\n") if isinstance(content, str) else content
+        for line in lines:
             if '->' in line:
-                # line = line.replace('"', '').replace(';', '').strip()
                 prefix, suffix = line.split('->')
                 prefix = prefix.replace('"', '').replace(';', '').strip()
                 suffix = suffix.replace('"', '').replace(';', '').strip()
-
-                prefix, suffix = prefix, suffix.strip('\n')
+                graph.add_edge(prefix, suffix)
                 if prefix == module:
-                    final_map[suffix] = []
-                else:
-                    intermediate_map[prefix].append(suffix)
+                    graph.add_root(suffix)
             else:
                 module = line[line.find('"') + 1:line.rfind('"')]
-
-        for key in final_map.keys():
-            values = intermediate_map[key]
-            while len(values) != 0:
-                next_key = values.pop()
-                final_map[key].append(next_key)
-                values.extend(intermediate_map[next_key])
-        return final_map
+        return graph
 
     @staticmethod
     def _parse_string(coordinates_str):
@@ -142,7 +239,7 @@ class MavenDependencyTreeGenerator(DependencyTreeGenerator):
 class NpmDependencyTreeGenerator(DependencyTreeGenerator):
     """Generate NPM Dependency Tree."""
 
-    def get_dependencies(self, manifests, show_transitive):
+    def get_dependencies(self, manifests, show_transitive, normalized=False):
         """Scan the npm dependencies files to fetch transitive deps."""
         deps = {}
         result = []
@@ -154,57 +251,49 @@ class NpmDependencyTreeGenerator(DependencyTreeGenerator):
                 "manifest_file": manifest['filename']
             }
 
-            data = manifest['content']
-
-            if isinstance(data, bytes):
-                data = data.decode("utf-8")
-
-            dependencies = json.loads(data).get('dependencies')
-            resolved = []
-            if dependencies:
-                for key, val in dependencies.items():
-                    version = val.get('version') or val.get('required').get('version')
-                    if version:
-                        transitive = []
-                        if show_transitive is True:
-                            tr_deps = val.get('dependencies') or \
-                                      val.get('required', {}).get('dependencies')
-                            if tr_deps:
-                                transitive = self._parse_transitives(transitive, tr_deps)
-                        tmp_json = {
-                            "package": key,
-                            "version": version,
-                            "deps": transitive
-                        }
-                        resolved.append(tmp_json)
-            dep['_resolved'] = resolved
+            graph = self.get_manifest_graph(manifest['content'])
+            dep.update(self._resolve_graph(graph, show_transitive is True,
+                                           lambda node: self._to_json(graph, node),
+                                           normalized=normalized))
             details.append(dep)
             details_json = {"details": details}
             result.append(details_json)
         deps['result'] = result
         return deps
 
-    def _parse_transitives(self, transitive, content):
-        """Scan the npm dependencies recursively to fetch transitive deps."""
-        if content:
-            for key, val in content.items():
-                version = val.get('version') or val.get('required').get('version')
-                if version:
-                    tmp_json = {
-                        "package": key,
-                        "version": version
-                    }
-                    transitive.append(tmp_json)
-                    tr_deps = val.get('dependencies') or val.get('required', {}).get('dependencies')
-                    if tr_deps:
-                        transitive = self._parse_transitives(transitive, tr_deps)
-        return transitive
+    def get_dependency_graph(self, content) -> DependencyGraph:
+        """Build the graph of the npm list output, nodes are keyed by (package, version)."""
+        graph = DependencyGraph()
+        dependencies = json.loads(content).get('dependencies')
+        if dependencies:
+            self._add_dependencies(graph, None, dependencies)
+        return graph
+
+    @staticmethod
+    def _to_json(graph, node):
+        """Return the package and version of a node."""
+        package, version = graph.keys[node]
+        return {"package": package, "version": version}
+
+    def _add_dependencies(self, graph, parent, dependencies):
+        """Scan the npm dependencies recursively to add them to the graph."""
+        for key, val in dependencies.items():
+            version = val.get('version') or val.get('required').get('version')
+            if version:
+                node = (key, version)
+                if parent is None:
+                    graph.add_root(node)
+                else:
+                    graph.add_edge(parent, node)
+                tr_deps = val.get('dependencies') or val.get('required', {}).get('dependencies')
+                if tr_deps:
+                    self._add_dependencies(graph, node, tr_deps)
 
 
 class PypiDependencyTreeGenerator(DependencyTreeGenerator):
     """Generate Pypi Dependency Tree."""
 
-    def get_dependencies(self, manifests, show_transitive):
+    def get_dependencies(self, manifests, show_transitive, normalized=False):
         """Scan the Pypi dependencies files to fetch transitive deps."""
         result = []
         details = []
@@ -215,23 +304,46 @@ class PypiDependencyTreeGenerator(DependencyTreeGenerator):
                 "manifest_file_path": manifest['filepath'],
                 "manifest_file": manifest['filename']
             }
-            data = manifest['content']
-
-            if isinstance(data, bytes):
-                data = data.decode("utf-8")
-            content = json.loads(data)
-            dep['_resolved'] = content
+            if normalized:
+                graph = self.get_manifest_graph(manifest['content'])
+                # pip list output is already flat, every direct dependency lists all its deps
+                dep.update(self._resolve_graph(graph, True,
+                                               lambda node: self._to_json(graph, node),
+                                               transitive=graph.successors, normalized=True))
+            else:
+                # the pip list output is passed through as is
+                dep['_resolved'] = json.loads(decode_content(manifest['content']))
             details.append(dep)
             details_json = {"details": details}
             result.append(details_json)
         deps['result'] = result
         return deps
 
+    @staticmethod
+    def get_dependency_graph(content) -> DependencyGraph:
+        """Build the graph of the pip list output, nodes are keyed by (package, version)."""
+        graph = DependencyGraph()
+        content = json.loads(content)
+        for package in content:
+            data = {k: v for k, v in package.items() if k != 'deps'}
+            graph.add_root((package['package'], package.get('version')), data)
+        for package in content:
+            for dep in package.get('deps', []):
+                graph.add_node((dep['package'], dep.get('version')), dep)
+                graph.add_edge((package['package'], package.get('version')),
+                               (dep['package'], dep.get('version')))
+        return graph
+
+    @staticmethod
+    def _to_json(graph, node):
+        """Return the package entry of a node as listed by pip."""
+        return graph.data[node]
+
 
 class GolangDependencyTreeGenerator(DependencyTreeGenerator):
     """Generate Golang Dependency Tree."""
 
-    def get_dependencies(self, manifests, show_transitive):
+    def get_dependencies(self, manifests, show_transitive, normalized=False):
         """Check Go Lang Dependencies."""
         details = []
         final = {}
@@ -242,38 +354,52 @@ class GolangDependencyTreeGenerator(DependencyTreeGenerator):
                 "manifest_file_path": manifest['filepath'],
                 "manifest_file": manifest['filename']
             }
-            resolved = []
-            direct_dep_list = []
-            dependencies = self._clean_dependencies(manifest['content'])
-            for dependency in dependencies:
-                # Find out Direct Dependencies listed against Module Package.
-                prefix, direct_dep = dependency.strip().split(" ")
-                if '@' not in prefix and (direct_dep not in direct_dep_list):
-                    # Only Module Packages have no @ in Prefix.
-                    parsed_json = self._parse_string(direct_dep)
-                    transitive_list = []
-                    trans = []
-                    if show_transitive:
-                        transitive_list = self._parse_transitives(
-                            dependencies, transitive_list, direct_dep, trans)
-                    parsed_json["deps"] = transitive_list
-                    resolved.append(parsed_json)
-            dep['_resolved'] = resolved
+            graph = self.get_manifest_graph(manifest['content'])
+            dep.update(self._resolve(graph, show_transitive, normalized))
             details.append(dep)
         result.append({"details": details})
         final["result"] = result
         return final
 
-    def _parse_transitives(self, data, transitive, suffix, trans):
-        """Scan the golang transitive deps."""
-        for line in data:
-            pref, suff = line.strip().split(" ")
-            if pref == suffix and suff not in trans:
-                trans.append(suff)
-                parsed_json = self._parse_string(suff)
-                transitive.append(parsed_json)
-                transitive = self._parse_transitives(data, transitive, suff, trans)
-        return transitive
+    def get_dependencies_from_stream(self, lines, filepath, filename, show_transitive,
+                                     normalized=False):
+        """Check Go Lang Dependencies read line by line, e.g. from a running go mod graph."""
+        graph = self.get_dependency_graph(line for line in lines if line.strip())
+        if not len(graph):
+            raise ValueError('Dependency list cannot be empty')
+        dep = {
+            "ecosystem": "golang",
+            "manifest_file_path": filepath,
+            "manifest_file": filename
+        }
+        dep.update(self._resolve(graph, show_transitive, normalized))
+        return {"result": [{"details": [dep]}]}
+
+    def _resolve(self, graph, show_transitive, normalized=False):
+        """Find out Direct Dependencies listed against Module Package."""
+        return self._resolve_graph(graph, show_transitive,
+                                   lambda node: self._to_json(graph, node),
+                                   normalized=normalized)
+
+    def get_manifest_graph(self, content):
+        """Parse the go mod graph output into a DependencyGraph."""
+        return self.get_dependency_graph(self._clean_dependencies(content))
+
+    def _to_json(self, graph, node):
+        """Return the parsed package@version of a node."""
+        return self._parse_string(graph.keys[node])
+
+    @staticmethod
+    def get_dependency_graph(dependencies) -> DependencyGraph:
+        """Build the graph of the go mod graph lines, nodes are keyed by package@version."""
+        graph = DependencyGraph()
+        for dependency in dependencies:
+            prefix, suffix = dependency.strip().split(" ")
+            graph.add_edge(prefix, suffix)
+            if '@' not in prefix:
+                # Only Module Packages have no @ in Prefix.
+                graph.add_root(suffix)
+        return graph
 
     def _parse_string(self, deps_string):
         """Parse string representation into a dictionary."""
@@ -299,8 +425,7 @@ class GolangDependencyTreeGenerator(DependencyTreeGenerator):
     @staticmethod
     def _clean_dependencies(dependencies) -> list:
         """Clean Golang Dep."""
-        if isinstance(dependencies, bytes):
-            dependencies = dependencies.decode("utf-8")
+        dependencies = decode_content(dependencies)
         dependencies = dependencies[:dependencies.rfind('\n')]
         if not dependencies:
             raise ValueError('Dependency list cannot be empty')
@@ -309,6 +434,8 @@ class GolangDependencyTreeGenerator(DependencyTreeGenerator):
     @staticmethod
     def clean_version(version):
         """Clean Version."""
+        import semver
+
         version = version.replace('v', '', 1)
         is_semver = semver.VersionInfo.isvalid(version)
         if is_semver:
@@ -1,37 +1,143 @@
 """Utilities required for user token management."""
-import tenacity
-from tenacity import retry
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from enum import Enum
-import requests
 import logging
-from cryptography.fernet import Fernet
-from .default_config import SNYK_API_TOKEN_VALIDATION_URL, ENCRYPTION_KEY_FOR_SNYK_TOKEN
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from .default_config import SNYK_API_TOKEN_VALIDATION_URL, ENCRYPTION_KEY_FOR_SNYK_TOKEN, \
+    SNYK_TOKEN_VALID_TTL, SNYK_TOKEN_INVALID_TTL
+from .retry_policy import RetryPolicy
 
 logger = logging.getLogger(__name__)
 
+SNYK_TOKEN_CACHE_SIZE = 10000
+SNYK_RETRY_POLICY = RetryPolicy(max_attempts=6)
+# Status codes of the validation endpoint stating that a token is invalid, other
+# failures such as 429 or 5xx don't say anything about the token and aren't cached.
+SNYK_INVALID_TOKEN_STATUS_CODES = {401, 403}
 
-@retry(reraise=True, stop=tenacity.stop_after_attempt(6),
-       wait=tenacity.wait_exponential(multiplier=2, min=4))
-def is_snyk_token_valid(snyk_api_token):
-    """Validate Snyk API token."""
+# sha256 of the token -> (is valid, expiry on the monotonic clock)
+_snyk_token_cache = OrderedDict()
+_snyk_token_cache_lock = threading.Lock()
+
+
+def is_snyk_token_valid(snyk_api_token, force_refresh=False):
+    """Validate Snyk API token.
+
+    Results are cached in memory for SNYK_TOKEN_VALID_TTL seconds when the token is
+    valid and SNYK_TOKEN_INVALID_TTL seconds when Snyk rejects it, other responses
+    and errors are not cached.
+
+    :param snyk_api_token: str, token to validate
+    :param force_refresh: bool, ask Snyk even if the result is cached
+    """
+    key = hashlib.sha256(snyk_api_token.encode()).hexdigest()
+    if not force_refresh:
+        with _snyk_token_cache_lock:
+            entry = _snyk_token_cache.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                _snyk_token_cache.move_to_end(key)
+                return entry[0]
+
+    status_code = _verify_snyk_token(snyk_api_token)
+    is_valid = status_code == 200
+    if not is_valid and status_code not in SNYK_INVALID_TOKEN_STATUS_CODES:
+        logger.warning("Snyk token validation returned {}, not caching it".format(status_code))
+        return False
+
+    ttl = SNYK_TOKEN_VALID_TTL if is_valid else SNYK_TOKEN_INVALID_TTL
+    with _snyk_token_cache_lock:
+        _snyk_token_cache[key] = (is_valid, time.monotonic() + ttl)
+        _snyk_token_cache.move_to_end(key)
+        while len(_snyk_token_cache) > SNYK_TOKEN_CACHE_SIZE:
+            _snyk_token_cache.popitem(last=False)
+    return is_valid
+
+
+def clear_snyk_token_cache():
+    """Forget all cached Snyk token validations."""
+    with _snyk_token_cache_lock:
+        _snyk_token_cache.clear()
+
+
+def _verify_snyk_token(snyk_api_token):
+    """Ask Snyk whether the API token is valid, return the status code of the response."""
     try:
-        response = requests.post(SNYK_API_TOKEN_VALIDATION_URL, json={'api': snyk_api_token})
-        return response.status_code == 200
+        response = SNYK_RETRY_POLICY.post(SNYK_API_TOKEN_VALIDATION_URL,
+                                          json={'api': snyk_api_token})
+        return response.status_code
     except Exception as e:
         logger.exception("Encountered exception calling Snyk")
         raise e
 
 
+@lru_cache(maxsize=8)
+def _get_cipher(keys):
+    """Build the cipher for the comma separated keys, the first one is used to encrypt."""
+    from cryptography.fernet import Fernet, MultiFernet
+
+    fernets = [Fernet(key.strip().encode()) for key in keys.split(',') if key.strip()]
+    if len(fernets) == 1:
+        return fernets[0]
+    return MultiFernet(fernets)
+
+
+def get_cipher():
+    """Return the cached cipher for the configured encryption keys."""
+    return _get_cipher(ENCRYPTION_KEY_FOR_SNYK_TOKEN)
+
+
 def encrypt_api_token(snyk_api_token):
     """Encryption of Api Token."""
-    cipher = Fernet(ENCRYPTION_KEY_FOR_SNYK_TOKEN.encode())
-    return cipher.encrypt(snyk_api_token.encode())
+    return get_cipher().encrypt(snyk_api_token.encode())
 
 
 def decrypt_api_token(snyk_api_token):
     """Decryption of Api Token."""
-    cipher = Fernet(ENCRYPTION_KEY_FOR_SNYK_TOKEN.encode())
-    return cipher.decrypt(snyk_api_token.encode())
+    return get_cipher().decrypt(snyk_api_token.encode())
+
+
+def rotate_api_token(snyk_api_token):
+    """Re-encrypt an Api Token with the current key.
+
+    Tokens encrypted with an older key keep decrypting as long as that key stays
+    configured, so they can be rotated lazily, e.g. whenever they are read.
+    """
+    from cryptography.fernet import MultiFernet
+
+    cipher = get_cipher()
+    if isinstance(cipher, MultiFernet):
+        return cipher.rotate(snyk_api_token.encode())
+    return cipher.encrypt(cipher.decrypt(snyk_api_token.encode()))
+
+
+def _map_tokens(func, snyk_api_tokens, max_workers):
+    """Apply func to every token, over a thread pool when max_workers is given."""
+    if not max_workers or max_workers < 2:
+        return [func(token) for token in snyk_api_tokens]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(func, snyk_api_tokens))
+
+
+def encrypt_api_tokens(snyk_api_tokens, max_workers=None):
+    """Encryption of many Api Tokens, results are in the order of the input.
+
+    :param snyk_api_tokens: iterable of str, tokens to encrypt
+    :param max_workers: int, number of threads to use, None to run in the caller thread
+    """
+    return _map_tokens(encrypt_api_token, snyk_api_tokens, max_workers)
+
+
+def decrypt_api_tokens(snyk_api_tokens, max_workers=None):
+    """Decryption of many Api Tokens, results are in the order of the input.
+
+    :param snyk_api_tokens: iterable of str, encrypted tokens
+    :param max_workers: int, number of threads to use, None to run in the caller thread
+    """
+    return _map_tokens(decrypt_api_token, snyk_api_tokens, max_workers)
 
 
 class UserStatus(Enum):
@@ -1,11 +1,8 @@
 """Helper functions related to versions."""
 
-import requests
 import logging
-from urllib.request import urlopen
-from lxml import etree
-from f8a_version_comparator.comparable_version import ComparableVersion
 from f8a_utils.golang_utils import GolangUtils
+from f8a_utils.retry_policy import DEFAULT_RETRY_POLICY
 
 _logger = logging.getLogger(__name__)
 
@@ -119,7 +116,7 @@ def get_versions_for_npm_package(package_name, latest=False, dual_values=False):
         pkg_name=package_name
     )
 
-    response = requests.get(url)
+    response = DEFAULT_RETRY_POLICY.get(url)
 
     if response.status_code != 200:
         _logger.info(
@@ -167,7 +164,7 @@ def get_versions_for_pypi_package(package_name, latest=False, dual_values=False)
         pkg_name=package_name
     )
 
-    response = requests.get(pypi_package_url)
+    response = DEFAULT_RETRY_POLICY.get(pypi_package_url)
     if response.status_code != 200:
         _logger.info(
             'Unable to fetch versions for package {pkg_name}'.format(pkg_name=package_name)
@@ -197,6 +194,8 @@ def get_versions_for_maven_package(package_name, latest=False, dual_values=False
     :param dual_values: boolean value, to return both version list and latest version
     :return list, list of versions
     """
+    from lxml import etree
+
     try:
         g, a = package_name.split(':')
         g = g.replace('.', '/')
@@ -210,7 +209,7 @@ def get_versions_for_maven_package(package_name, latest=False, dual_values=False
 
             url = 'https://repo.maven.apache.org/maven2/{g}/{a}/{f}'.format(g=g, a=a, f=filename)
             try:
-                metadata_xml = etree.parse(urlopen(url))
+                metadata_xml = etree.parse(DEFAULT_RETRY_POLICY.urlopen(url))
                 ok = True  # We successfully downloaded the file
                 version_elements = metadata_xml.findall('.//version')
                 version = metadata_xml.find('.//release').text if \
@@ -242,6 +241,8 @@ def select_latest_version(versions=[]):
     """Select latest version from list."""
     if len(versions) == 0:
         return ""
+    from f8a_version_comparator.comparable_version import ComparableVersion
+
     version_arr = []
     for x in versions:
         version_arr.append(ComparableVersion(x))
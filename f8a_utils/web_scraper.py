@@ -18,8 +18,7 @@
 """Functionality to fetch details from HTML pages."""
 
 
-from bs4 import BeautifulSoup
-import requests
+from f8a_utils.retry_policy import DEFAULT_RETRY_POLICY
 
 
 class Scraper:
@@ -27,7 +26,9 @@ class Scraper:
 
     def __init__(self, url):
         """Init method for Scraper class."""
-        html_content = requests.get(url).text
+        from bs4 import BeautifulSoup
+
+        html_content = DEFAULT_RETRY_POLICY.get(url).text
         self.DATA = BeautifulSoup(html_content, "lxml")
 
     def get_data(self):
@@ -21,9 +21,18 @@ setup(
     version='0.1.0',
     description='Library containing utilities and helper functions for f8a services',
     install_requires=install_requires,
+    extras_require={
+        'fast-json': ['orjson'],
+        'async': ['aiohttp'],
+    },
     license='Apache-2.0',
     author='Michal Srb',
     author_email='michal@redhat.com',
     url='https://github.com/fabric8-analytics/fabric8-analytics-utils',
     packages=find_packages(exclude=['tests']),
+    entry_points={
+        'console_scripts': [
+            'f8a-scan-dependencies = f8a_utils.cli:main',
+        ],
+    },
 )
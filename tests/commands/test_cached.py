@@ -0,0 +1,81 @@
+"""Test f8a_utils.commands.cached module."""
+import os
+
+from f8a_utils.commands import CachedExternalCommand
+
+
+def _counting_cmd(tmp_path, cache_dir, max_size=1024 * 1024):
+    """Return a command counting its runs in a file, with go.sum as input."""
+    script = 'echo run >> {c}; cat go.sum'.format(c=tmp_path / 'runs')
+    return CachedExternalCommand(['bash', '-c', script], ['go.sum'],
+                                 cache_dir=str(cache_dir), max_size=max_size)
+
+
+def _runs(tmp_path):
+    """Return how many times the command really ran."""
+    return len((tmp_path / 'runs').read_text().splitlines())
+
+
+def test_cache_hit_and_invalidation(tmp_path):
+    """Test that unchanged inputs skip the subprocess and changed ones don't."""
+    cache_dir = tmp_path / 'cache'
+    (tmp_path / 'go.sum').write_text('v1\n')
+    cmd = _counting_cmd(tmp_path, cache_dir)
+    assert cmd.run(cwd=str(tmp_path)) is True
+    assert cmd.cache_hit is False
+
+    seen = []
+    cmd = _counting_cmd(tmp_path, cache_dir)
+    cmd._metrics_hook = seen.append
+    assert cmd.run(cwd=str(tmp_path)) is True
+    assert cmd.cache_hit is True
+    assert cmd.stdout == 'v1\n'
+    assert cmd.rc == 0
+    assert cmd.duration is not None
+    assert seen == [cmd]
+    assert _runs(tmp_path) == 1
+
+    (tmp_path / 'go.sum').write_text('v2\n')
+    assert cmd.run(cwd=str(tmp_path)) is True
+    assert cmd.cache_hit is False
+    assert cmd.stdout == 'v2\n'
+    assert _runs(tmp_path) == 2
+
+    # the environment is part of the key
+    assert cmd.run(cwd=str(tmp_path), update_env={'GOFLAGS': '-mod=mod'}) is True
+    assert _runs(tmp_path) == 3
+
+
+def test_failures_not_cached(tmp_path):
+    """Test that failed runs are not cached."""
+    cmd = _counting_cmd(tmp_path, tmp_path / 'cache')
+    assert cmd.run(cwd=str(tmp_path)) is False
+    assert cmd.run(cwd=str(tmp_path)) is False
+    assert _runs(tmp_path) == 2
+
+
+def test_lru_eviction(tmp_path):
+    """Test that least recently used entries are evicted past max_size."""
+    cache_dir = tmp_path / 'cache'
+    (tmp_path / 'go.sum').write_text('x' * 100)
+    for i in range(3):
+        cmd = CachedExternalCommand(['bash', '-c', 'cat go.sum; echo {}'.format(i)], ['go.sum'],
+                                    cache_dir=str(cache_dir), max_size=300)
+        assert cmd.run(cwd=str(tmp_path)) is True
+    entries = os.listdir(str(cache_dir))
+    assert len(entries) == 2
+    assert sum(os.path.getsize(str(cache_dir / e)) for e in entries) <= 300
+
+
+def test_cache_dir_permissions(tmp_path):
+    """Test that the cache directory is private and not used if others can write to it."""
+    cache_dir = tmp_path / 'cache'
+    (tmp_path / 'go.sum').write_text('v1\n')
+    assert _counting_cmd(tmp_path, cache_dir).run(cwd=str(tmp_path)) is True
+    assert os.stat(str(cache_dir)).st_mode & 0o777 == 0o700
+
+    os.chmod(str(cache_dir), 0o777)
+    cmd = _counting_cmd(tmp_path, cache_dir)
+    assert cmd.run(cwd=str(tmp_path)) is True
+    assert cmd.cache_hit is False
+    assert _runs(tmp_path) == 2
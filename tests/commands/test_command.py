@@ -1,10 +1,12 @@
 """Test f8a_worker.commands.command module."""
+import asyncio
+import mmap
 import os
 import time
 import pytest
 import subprocess
 
-from f8a_utils.commands import ExternalCommand
+from f8a_utils.commands import ExternalCommand, set_metrics_hook
 
 
 def test_success():
@@ -47,6 +49,16 @@ def test_timeout_raise():
         ExternalCommand(['bash', '-c', 'sleep 10']).run(timeout=1, raise_on_error=True)
 
 
+def test_stdin_pipe():
+    """Test that a piped stdin is closed, so commands reading it don't hang."""
+    cmd = ExternalCommand(['cat'])
+    start = time.time()
+    assert cmd.run(stdin=subprocess.PIPE, timeout=3) is True
+    assert time.time() - start < 2
+    assert cmd.expired is False
+    assert cmd.stdout == ''
+
+
 def test_update_env():
     """Test updating environment."""
     cmd = ExternalCommand(['bash', '-c', 'echo -n "You know nothing, ${NAME}..."'])
@@ -81,3 +93,258 @@ def test_kill_children():
 def test_magic_str():
     """Test str(ExternalCommand)."""
     assert str(ExternalCommand(['java', '-version'])) == 'ExternalCommand: java -version'
+
+
+def test_iter_lines():
+    """Test streaming stdout lines."""
+    cmd = ExternalCommand(['bash', '-c', 'echo one; echo two >&2; echo three'])
+    assert list(cmd.iter_lines()) == ['one\n', 'three\n']
+    assert cmd.rc == 0
+    assert cmd.stdout is None
+    assert cmd.stderr == 'two\n'
+    assert cmd.duration is not None
+
+
+def test_iter_lines_before_exit():
+    """Test that lines are delivered while the command still runs."""
+    cmd = ExternalCommand(['bash', '-c', 'echo first; sleep 2; echo second'])
+    lines = cmd.iter_lines()
+    start = time.time()
+    assert next(lines) == 'first\n'
+    assert time.time() - start < 1.5
+    assert list(lines) == ['second\n']
+
+
+def test_run_line_callback():
+    """Test run with a line callback."""
+    lines = []
+    cmd = ExternalCommand(['bash', '-c', 'seq 3; exit 2'])
+    assert cmd.run(line_callback=lines.append) is False
+    assert lines == ['1\n', '2\n', '3\n']
+    assert cmd.rc == 2
+    with pytest.raises(subprocess.CalledProcessError):
+        cmd.run(line_callback=lines.append, raise_on_error=True)
+
+
+def test_iter_lines_timeout():
+    """Test that streamed commands time out and kill the process group."""
+    cmd = ExternalCommand(['bash', '-c', 'echo start; sleep 10'])
+    assert list(cmd.iter_lines(timeout=1)) == ['start\n']
+    assert cmd.expired is True
+    assert cmd.rc == 1
+    assert cmd.duration < 5
+
+
+def test_iter_lines_timeout_stdout_closed():
+    """Test that a command closing stdout and running on still times out."""
+    cmd = ExternalCommand(['bash', '-c', 'echo hi; exec 1>&-; sleep 8'])
+    start = time.time()
+    assert list(cmd.iter_lines(timeout=1)) == ['hi\n']
+    assert time.time() - start < 5
+    assert cmd.expired is True
+    assert cmd.rc == 1
+
+
+def test_iter_lines_closed_early():
+    """Test that closing the generator kills the command and still finishes it."""
+    seen = []
+    cmd = ExternalCommand(['bash', '-c', 'while true; do echo y; done'], metrics_hook=seen.append)
+    lines = cmd.iter_lines(raise_on_error=True)
+    assert next(lines) == 'y\n'
+    lines.close()
+    assert cmd.rc == -9
+    assert cmd.duration is not None
+    assert seen == [cmd]
+
+
+def test_run_line_callback_raises():
+    """Test that a failing line callback kills the command and the error propagates."""
+    def callback(line):
+        raise ValueError(line)
+
+    seen = []
+    cmd = ExternalCommand(['bash', '-c', 'while true; do echo y; done'], metrics_hook=seen.append)
+    with pytest.raises(ValueError):
+        cmd.run(line_callback=callback, raise_on_error=True)
+    assert cmd.rc == -9
+    assert seen == [cmd]
+
+
+def _run_async(*coroutines):
+    """Run the coroutines concurrently in a new event loop."""
+    async def gather():
+        return await asyncio.gather(*coroutines)
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(gather())
+    finally:
+        loop.close()
+
+
+def test_run_async():
+    """Test the asyncio variant of run."""
+    cmd = ExternalCommand(['bash', '-c', 'echo -n "You know nothing, ${NAME}..."; echo -n x >&2'])
+    assert _run_async(cmd.run_async(update_env={'NAME': 'Jon Snow'})) == [True]
+    assert cmd.stdout == 'You know nothing, Jon Snow...'
+    assert cmd.stderr == 'x'
+    assert cmd.rc == 0
+    assert cmd.duration is not None
+
+    cmd = ExternalCommand(['bash', '-c', 'pwd; printf "a\\r\\nb"; exit 3'])
+    assert _run_async(cmd.run_async(cwd='/', env={})) == [False]
+    assert cmd.stdout == '/\na\nb'
+    assert cmd.rc == 3
+    with pytest.raises(subprocess.CalledProcessError):
+        _run_async(cmd.run_async(raise_on_error=True))
+
+
+def test_run_async_resource_usage():
+    """Test that a reused command doesn't report the resource usage of an earlier run."""
+    cmd = ExternalCommand(['bash', '-c', 'true'])
+    assert cmd.run() is True
+    assert cmd.resource_usage is not None
+    assert _run_async(cmd.run_async()) == [True]
+    assert cmd.resource_usage is None
+
+
+def test_run_async_concurrently():
+    """Test that many commands are awaited from one event loop."""
+    commands = [ExternalCommand(['bash', '-c', 'sleep 1']) for _ in range(4)]
+    start = time.time()
+    assert _run_async(*(cmd.run_async() for cmd in commands)) == [True] * 4
+    assert time.time() - start < 3
+
+
+def test_run_async_timeout():
+    """Test that timed out asyncio commands have their process group killed."""
+    cmd = ExternalCommand(['bash', '-c', 'bash -c "sleep 10" & echo -n $!; sleep 10'])
+    assert _run_async(cmd.run_async(timeout=1)) == [False]
+    assert cmd.expired is True
+    assert cmd.rc == 1
+    child_pid = int(cmd.stdout)
+    # killed processes may take a while to be reaped
+    time.sleep(3)
+    with pytest.raises(OSError):
+        os.kill(child_pid, 0)
+
+
+def test_run_async_cancelled(tmp_path):
+    """Test that cancelling the awaiting task kills the process group."""
+    pid_file = str(tmp_path / 'pid')
+    cmd = ExternalCommand(['bash', '-c', 'bash -c "sleep 10" & echo -n $! > {f}; sleep 10'.format(
+        f=pid_file)])
+
+    async def cancel():
+        task = asyncio.ensure_future(cmd.run_async())
+        await asyncio.sleep(1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.time()
+    _run_async(cancel())
+    assert time.time() - start < 5
+    assert cmd.rc == -9
+    with open(pid_file) as f:
+        child_pid = int(f.read())
+    # killed processes may take a while to be reaped
+    time.sleep(3)
+    with pytest.raises(OSError):
+        os.kill(child_pid, 0)
+
+
+def test_resource_usage():
+    """Test that the resource usage of the child is recorded."""
+    cmd = ExternalCommand(['python3', '-c', 'x = bytearray(64 * 1024 * 1024); sum(range(10**6))'])
+    assert cmd.run() is True
+    usage = cmd.resource_usage
+    assert usage['max_rss_kb'] > 64 * 1024
+    assert usage['user_time'] + usage['system_time'] > 0
+    assert set(usage) == {'user_time', 'system_time', 'max_rss_kb', 'block_input',
+                          'block_output', 'voluntary_context_switches',
+                          'involuntary_context_switches'}
+
+    cmd = ExternalCommand(['bash', '-c', 'sleep 10'])
+    assert cmd.run(timeout=1) is False
+    assert cmd.resource_usage is not None
+
+    cmd = ExternalCommand(['bash', '-c', 'echo x'])
+    assert list(cmd.iter_lines()) == ['x\n']
+    assert cmd.resource_usage['max_rss_kb'] > 0
+
+
+def test_poll():
+    """Test that the started process can be polled, before and after it is reaped."""
+    cmd = ExternalCommand(['bash', '-c', 'sleep 1; echo x'])
+    piped = cmd._start_piped(True, 5, None, None, None, None)
+    assert piped.proc.poll() is None
+    assert piped.proc.stdout.read() == 'x\n'
+    cmd._stop_piped(piped, True, 5)
+    assert piped.proc.poll() == 0
+    assert cmd.rc == 0
+    assert cmd.resource_usage is not None
+
+    # reaped by poll() first, the exit status is still known
+    cmd = ExternalCommand(['bash', '-c', 'exit 3'])
+    piped = cmd._start_piped(True, None, None, None, None, None)
+    assert piped.proc.stdout.read() == ''
+    while piped.proc.poll() is None:
+        time.sleep(0.1)
+    cmd._stop_piped(piped, True, None)
+    assert cmd.rc == 3
+    assert cmd.resource_usage is None
+
+
+def test_metrics_hook():
+    """Test the metrics hooks."""
+    seen = []
+    assert ExternalCommand(['bash', '-c', 'true'], metrics_hook=seen.append).run() is True
+    assert seen[0].resource_usage is not None
+
+    set_metrics_hook(lambda cmd: seen.append(cmd.duration))
+    try:
+        ExternalCommand(['bash', '-c', 'false']).run()
+        assert isinstance(seen[1], float)
+        set_metrics_hook(lambda cmd: 1 / 0)
+        assert ExternalCommand(['bash', '-c', 'true']).run() is True
+    finally:
+        set_metrics_hook(None)
+
+
+def test_run_binary_in_memory():
+    """Test raw output kept in memory."""
+    cmd = ExternalCommand(['bash', '-c', 'printf "a\\r\\nb\\xff"; printf err >&2'])
+    assert cmd.run_binary() is True
+    assert isinstance(cmd.stdout, memoryview)
+    assert bytes(cmd.stdout) == b'a\r\nb\xff'
+    assert cmd.stderr == b'err'
+
+
+def test_run_binary_spilled():
+    """Test raw output spilled to a memory mapped file."""
+    cmd = ExternalCommand(['bash', '-c', 'head -c 300000 /dev/zero; echo -n end'])
+    assert cmd.run_binary(spill_threshold=100000) is True
+    assert isinstance(cmd.stdout, mmap.mmap)
+    assert len(cmd.stdout) == 300003
+    assert cmd.stdout[-3:] == b'end'
+
+
+def test_run_binary_timeout():
+    """Test timeout of run_binary."""
+    cmd = ExternalCommand(['bash', '-c', 'echo -n start; sleep 10'])
+    assert cmd.run_binary(timeout=1) is False
+    assert cmd.expired is True
+    assert bytes(cmd.stdout) == b'start'
+    with pytest.raises(subprocess.CalledProcessError):
+        ExternalCommand(['bash', '-c', 'false']).run_binary(raise_on_error=True)
+
+
+def test_run_binary_timeout_stdout_closed():
+    """Test that run_binary times out when the command closes stdout and runs on."""
+    cmd = ExternalCommand(['bash', '-c', 'echo -n hi; exec 1>&-; sleep 8'])
+    start = time.time()
+    assert cmd.run_binary(timeout=1) is False
+    assert time.time() - start < 5
+    assert cmd.expired is True
+    assert bytes(cmd.stdout) == b'hi'
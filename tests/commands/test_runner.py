@@ -0,0 +1,45 @@
+"""Test f8a_utils.commands.runner module."""
+import time
+import pytest
+import subprocess
+
+from f8a_utils.commands import ExternalCommand, ExternalCommandRunner
+
+
+def test_run_in_parallel():
+    """Test that commands run in parallel and results keep their order."""
+    commands = [ExternalCommand(['bash', '-c', 'sleep 1; echo -n {}'.format(i)]) for i in range(4)]
+    commands.append(ExternalCommand(['bash', '-c', 'false']))
+    start = time.time()
+    assert ExternalCommandRunner(max_workers=5).run(commands) == [True] * 4 + [False]
+    assert time.time() - start < 3
+    assert [cmd.stdout for cmd in commands[:4]] == ['0', '1', '2', '3']
+
+
+def test_max_workers():
+    """Test the parallelism limit."""
+    commands = [ExternalCommand(['bash', '-c', 'sleep 1']) for _ in range(2)]
+    start = time.time()
+    assert ExternalCommandRunner(max_workers=1).run(commands) == [True, True]
+    assert time.time() - start >= 2
+    with pytest.raises(ValueError):
+        ExternalCommandRunner(max_workers=0)
+
+
+def test_per_command_timeout():
+    """Test per-command timeouts overriding the shared ones."""
+    slow = ExternalCommand(['bash', '-c', 'sleep 10'])
+    fast = ExternalCommand(['bash', '-c', 'sleep 2'])
+    results = ExternalCommandRunner().run([(slow, {'timeout': 1}), fast], timeout=5)
+    assert results == [False, True]
+    assert slow.expired is True
+    assert fast.expired is False
+
+
+def test_raise_on_error():
+    """Test that failures are raised once all commands have finished."""
+    ok = ExternalCommand(['bash', '-c', 'sleep 1'])
+    with pytest.raises(subprocess.CalledProcessError):
+        ExternalCommandRunner().run([ExternalCommand(['bash', '-c', 'false']), ok],
+                                    raise_on_error=True)
+    assert ok.rc == 0
@@ -0,0 +1,62 @@
+"""Test f8a_utils.cli module."""
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from f8a_utils.cli import main, find_manifests
+
+DATA = str(Path(__file__).parent / "data")
+
+
+def _run(argv):
+    """Run the cli and return its exit code and parsed records."""
+    out = io.StringIO()
+    rc = main(argv, out=out)
+    return rc, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_find_manifests():
+    """Test that manifests are detected by their file names."""
+    manifests = dict((Path(p).name, e) for p, e in find_manifests([DATA]))
+    assert manifests == {"dependencies.txt": "maven", "gograph.txt": "golang",
+                         "npmlist.json": "npm", "pylist.json": "pypi"}
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_scan_directory(jobs):
+    """Test that every manifest of a directory gets a record."""
+    rc, records = _run(["--jobs", jobs, "--show-transitive", DATA])
+    assert rc == 0
+    records = {r["ecosystem"]: r for r in records}
+    assert sorted(records) == ["golang", "maven", "npm", "pypi"]
+    with open(DATA + "/golang_dep_tree.json") as fp:
+        expected = json.load(fp)["result"][0]["details"][0]["_resolved"]
+    assert records["golang"]["result"][0]["details"][0]["_resolved"] == expected
+    resolved = records["maven"]["result"][0]["details"][0]["_resolved"][0]
+    assert len(resolved["deps"]) == 15
+
+
+def test_scan_errors():
+    """Test that failing manifests are reported and set the exit code."""
+    rc, records = _run(["-j", "1", DATA + "/gograph_empty.txt",
+                        DATA + "/dependencies_invalid_coordinates.txt"])
+    assert rc == 1
+    assert "--ecosystem" in records[0]["error"]
+
+    rc, records = _run(["-j", "1", "-e", "golang", DATA + "/gograph_empty.txt"])
+    assert rc == 1
+    assert records[0]["error"] == "ValueError: Dependency list cannot be empty"
+
+
+def test_scan_normalized():
+    """Test the normalized output format."""
+    rc, records = _run(["-j", "1", "-t", "-n", DATA + "/npmlist.json"])
+    assert rc == 0
+    details = records[0]["result"][0]["details"][0]
+    assert details["nodes"] == [{"package": "body-parser", "version": "1.18.2"},
+                                {"package": "debug", "version": "2.6.9"},
+                                {"package": "ms", "version": "2.0.0"}]
+    assert details["direct"] == [0]
+    assert details["edges"] == [[0, 1], [1, 2]]
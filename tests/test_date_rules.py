@@ -0,0 +1,102 @@
+"""Test file for the compiled vulnerability date range rules."""
+
+from datetime import datetime
+
+import pytest
+
+from f8a_utils.date_rules import compile_date_rule, to_timestamp, DateRangeRule, \
+    evaluate_date_rules, parse_commit_date
+
+RULES = ">#2020-09-15T13:19:13Z&<=#2020-09-16T13:19:13Z," \
+        ">=#2020-09-16T13:19:13Z&<#2020-09-17T13:19:13Z," \
+        "=#2020-09-17T13:19:13Z"
+
+
+def _date(value):
+    """Parse the rule date format."""
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+
+
+def test_compile_date_rule_merges_intervals():
+    """Test that overlapping and adjacent intervals are merged."""
+    rule = compile_date_rule(RULES)
+    assert rule.intervals == [(to_timestamp(_date("2020-09-15T13:19:14Z")),
+                               to_timestamp(_date("2020-09-17T13:19:13Z")))]
+    assert _date("2020-09-16T10:10:10Z") in rule
+    assert _date("2020-09-17T13:19:13Z") in rule
+    assert _date("2020-09-15T13:19:13Z") not in rule
+    assert _date("2020-09-17T13:19:14Z") not in rule
+
+
+def test_compile_date_rule_operators():
+    """Test every operator against its bounds."""
+    point = _date("2020-09-17T13:19:13Z")
+    before = _date("2020-09-17T13:19:12Z")
+    after = _date("2020-09-17T13:19:14Z")
+    cases = {
+        "<": (True, False, False),
+        "<=": (True, True, False),
+        ">": (False, False, True),
+        ">=": (False, True, True),
+        "=": (False, True, False),
+        "!": (False, False, False),
+    }
+    for operator, expected in cases.items():
+        rule = compile_date_rule(operator + "#2020-09-17T13:19:13Z")
+        assert (before in rule, point in rule, after in rule) == expected, operator
+
+
+def test_compile_date_rule_wildcard_and_empty():
+    """Test '*' and contradicting conditions."""
+    assert _date("1970-01-01T00:00:00Z") in compile_date_rule("*")
+    rule = compile_date_rule(">#2020-09-17T13:19:13Z&<#2020-09-16T13:19:13Z")
+    assert rule.intervals == []
+    assert _date("2020-09-17T00:00:00Z") not in rule
+    rule = compile_date_rule(">#2020-09-10T00:00:00Z&<#2020-09-20T00:00:00Z&!#2020-09-15T00:00:00Z")
+    assert rule.intervals == []
+
+
+def test_compile_date_rule_cache():
+    """Test that compiled rules are cached and accepted as input."""
+    rule = compile_date_rule(RULES)
+    assert compile_date_rule(RULES) is rule
+    assert compile_date_rule(rule) is rule
+    assert isinstance(rule, DateRangeRule)
+    assert repr(rule).startswith("DateRangeRule(")
+
+
+def test_compile_date_rule_invalid():
+    """Test invalid dates."""
+    with pytest.raises(ValueError):
+        compile_date_rule(">#2020-09-17")
+
+
+def test_parse_commit_date():
+    """Test parse_commit_date."""
+    assert parse_commit_date("20200917131913") == to_timestamp(_date("2020-09-17T13:19:13Z"))
+    assert parse_commit_date("20201317131913") is None
+    assert parse_commit_date("0d4799964558") is None
+    assert parse_commit_date("") is None
+    assert parse_commit_date(None) is None
+
+
+def test_evaluate_date_rules():
+    """Test that the bulk evaluation matches the single evaluation."""
+    dates = ["20200916101010", "20200917131913", "bad", "20200915131913", "20200101000000",
+             "20200917131914"]
+    rules = [RULES, "*", "<#2020-09-16T00:00:00Z", compile_date_rule("=#2020-09-17T13:19:14Z")]
+    matrix = evaluate_date_rules(dates, rules)
+    assert matrix == [
+        [True, True, False, False],
+        [True, True, False, False],
+        None,
+        [False, True, True, False],
+        [False, True, True, False],
+        [False, True, False, True],
+    ]
+    for date, row in zip(dates, matrix):
+        timestamp = parse_commit_date(date)
+        if timestamp is not None:
+            assert row == [compile_date_rule(rule).contains_timestamp(timestamp) for rule in rules]
+    assert evaluate_date_rules([], rules) == []
+    assert evaluate_date_rules(dates[:1], []) == [[]]
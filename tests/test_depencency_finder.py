@@ -1,7 +1,9 @@
 """Tests for classes from depencency_finder module."""
 import json
+import subprocess
 import unittest
 
+from f8a_utils.commands import ExternalCommand
 from f8a_utils.dependency_finder import DependencyFinder
 from pathlib import Path
 import pytest
@@ -48,6 +50,23 @@ def test_scan_and_find_dependencies_pypi():
     assert len(res['result'][0]['details'][0]['_resolved'][0]['deps']) == 1
 
 
+def test_scan_and_find_dependencies_pypi_passed_through():
+    """Test that the pip list output is returned unchanged."""
+    content = [
+        {"package": "django", "version": "1.2.1",
+         "deps": [{"package": "pytz", "version": "2019.1", "license": "MIT"}]},
+        {"package": "pytz", "version": "2019.1"},
+        {"package": "flask"}
+    ]
+    manifests = [{
+        "filename": "pylist.json",
+        "filepath": "/bin/local",
+        "content": json.dumps(content)
+    }]
+    res = DependencyFinder().scan_and_find_dependencies("pypi", manifests, True)
+    assert res['result'][0]['details'][0]['_resolved'] == content
+
+
 def test_scan_and_find_dependencies_golang():
     """Test scan_and_find_dependencies function for golang."""
     manifests = [{
@@ -239,6 +258,114 @@ def test_scan_and_find_dependencies_maven_ignore_test_deps():
         assert package['package'] not in test_packages
 
 
+def test_scan_and_find_dependencies_maven_from_buffer():
+    """Test scan_and_find_dependencies with the buffer produced by ExternalCommand.run_binary."""
+    cmd = ExternalCommand(['cat', str(Path(__file__).parent / "data/dependencies.txt")])
+    assert cmd.run_binary(spill_threshold=100) is True
+    manifests = [{
+        "filename": "dependencies.txt",
+        "filepath": "/bin/local",
+        "content": cmd.stdout
+    }]
+    res = DependencyFinder().scan_and_find_dependencies("maven", manifests, True)
+    resolved = res['result'][0]['details'][0]['_resolved'][0]
+    assert resolved['package'] == "io.vertx:vertx-core"
+    assert len(resolved['deps']) == 15
+
+
+def test_scan_command_output_golang():
+    """Test scan_command_output streaming go mod graph output."""
+    cmd = ['cat', str(Path(__file__).parent / "data/gograph.txt")]
+    with open(str(Path(__file__).parent / "data/golang_dep_tree.json")) as fp:
+        dep_tree = json.load(fp)
+    res = DependencyFinder().scan_command_output("golang", cmd, "/bin/local", "gograph.txt", True)
+    assert res == dep_tree
+
+
+def test_scan_command_output_maven():
+    """Test scan_command_output streaming the maven dot output."""
+    cmd = ExternalCommand(['cat', str(Path(__file__).parent / "data/dependencies.txt")])
+    res = DependencyFinder().scan_command_output("maven", cmd, "/bin/local", "dependencies.txt",
+                                                 "true")
+    resolved = res['result'][0]['details'][0]['_resolved'][0]
+    assert resolved['package'] == "io.vertx:vertx-core"
+    assert len(resolved['deps']) == 15
+    assert cmd.rc == 0
+
+
+def test_scan_command_output_npm():
+    """Test scan_command_output for an ecosystem parsed as a whole."""
+    cmd = ['cat', str(Path(__file__).parent / "data/npmlist.json")]
+    res = DependencyFinder().scan_command_output("npm", cmd, "/bin/local", "npmlist.json", True)
+    assert res['result'][0]['details'][0]['manifest_file'] == "npmlist.json"
+    assert res['result'][0]['details'][0]['_resolved']
+
+
+def test_scan_command_output_failure():
+    """Test that scan_command_output raises when the command fails."""
+    with pytest.raises(subprocess.CalledProcessError):
+        DependencyFinder().scan_command_output("golang", ['bash', '-c', 'echo "a b@v1"; exit 1'],
+                                               "/bin/local", "gograph.txt", True)
+
+
+def _expand_normalized(details):
+    """Rebuild the _resolved list from the normalized format, transitives in preorder."""
+    successors = [[] for _ in details['nodes']]
+    for source, target in details['edges']:
+        successors[source].append(target)
+    resolved = []
+    for direct in details['direct']:
+        seen, deps, stack = set(), [], [iter(successors[direct])]
+        while stack:
+            for node in stack[-1]:
+                if node not in seen:
+                    seen.add(node)
+                    deps.append(details['nodes'][node])
+                    stack.append(iter(successors[node]))
+                    break
+            else:
+                stack.pop()
+        resolved.append(dict(details['nodes'][direct], deps=deps))
+    return resolved
+
+
+def test_scan_and_find_dependencies_golang_normalized():
+    """Test that the normalized format holds the same dependencies as the tree."""
+    manifests = [{
+        "filename": "gograph.txt",
+        "filepath": "/bin/local",
+        "content": open(str(Path(__file__).parent / "data/gograph.txt")).read()
+    }]
+    tree = DependencyFinder().scan_and_find_dependencies("golang", manifests, True)
+    res = DependencyFinder().scan_and_find_dependencies("golang", manifests, True, normalized=True)
+    details = res['result'][0]['details'][0]
+    assert '_resolved' not in details
+    assert details['manifest_file'] == "gograph.txt"
+    assert len(details['nodes']) == len({n['from'] for n in details['nodes']})
+    assert _expand_normalized(details) == tree['result'][0]['details'][0]['_resolved']
+
+    res = DependencyFinder().scan_and_find_dependencies("golang", manifests, False, normalized=True)
+    details = res['result'][0]['details'][0]
+    assert len(details['nodes']) == len(details['direct']) == 39
+    assert details['edges'] == []
+
+
+def test_scan_and_find_dependencies_maven_normalized():
+    """Test the normalized format for Maven, test dependencies are left out."""
+    manifests = [{
+        "filename": "dependencies.txt",
+        "filepath": "/bin/local",
+        "content": open(str(Path(__file__).parent / "data/dependencies.txt")).read()
+    }]
+    res = DependencyFinder().scan_and_find_dependencies("maven", manifests, True, normalized=True)
+    details = res['result'][0]['details'][0]
+    direct = [details['nodes'][i]['package'] for i in details['direct']]
+    assert direct == ['io.vertx:vertx-core', 'io.vertx:vertx-web', 'io.vertx:vertx-health-check',
+                      'io.vertx:vertx-web-client']
+    resolved = _expand_normalized(details)
+    assert len(resolved[0]['deps']) == 15
+
+
 if __name__ == '__main__':
     test_scan_and_find_dependencies_npm()
     test_scan_and_find_dependencies_npm_npm_list_as_bytes()
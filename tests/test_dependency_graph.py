@@ -0,0 +1,87 @@
+"""Test f8a_utils.dependency_graph module."""
+import time
+
+from f8a_utils.dependency_graph import DependencyGraph
+from f8a_utils.tree_generator import NpmDependencyTreeGenerator
+
+
+def _graph(edges, roots=()):
+    """Build a graph from (source, target) key pairs."""
+    graph = DependencyGraph()
+    for source, target in edges:
+        graph.add_edge(source, target)
+    for root in roots:
+        graph.add_root(root)
+    return graph
+
+
+def test_interning_and_stats():
+    """Test that keys are interned and duplicate edges are dropped."""
+    graph = _graph([("a", "b"), ("a", "c"), ("a", "b"), ("b", "c")], roots=["a", "a"])
+    assert graph.keys == ["a", "b", "c"]
+    assert graph.node_id("c") == 2
+    assert graph.node_id("x") is None
+    assert graph.roots == [0]
+    assert list(graph.successors(0)) == [1, 2]
+    assert graph.stats() == {"nodes": 3, "edges": 3, "roots": 1}
+
+    graph.add_node("a", data={"x": 1})
+    graph.add_node("a", data={"x": 2})
+    assert graph.data[0] == {"x": 1}
+
+
+def test_closure_order():
+    """Test the preorder of the closure, its reverse and deduplication of diamonds."""
+    graph = _graph([("r", "a"), ("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"), ("d", "e")])
+    keys = graph.keys
+    assert [keys[n] for n in graph.closure(graph.node_id("a"))] == ["b", "d", "e", "c"]
+    assert [keys[n] for n in graph.closure(graph.node_id("a"), reverse=True)] == \
+        ["c", "d", "e", "b"]
+    assert graph.closure(graph.node_id("e")) == []
+
+
+def test_predecessors():
+    """Test the reverse adjacency, also after adding edges."""
+    graph = _graph([("a", "c"), ("b", "c"), ("a", "c")])
+    assert [graph.keys[n] for n in graph.predecessors(graph.node_id("c"))] == ["a", "b"]
+    assert list(graph.predecessors(graph.node_id("a"))) == []
+    graph.add_edge("c", "a")
+    assert [graph.keys[n] for n in graph.predecessors(graph.node_id("a"))] == ["c"]
+
+
+def test_closure_cycle():
+    """Test that cycles terminate and list the start node."""
+    graph = _graph([("a", "b"), ("b", "a")])
+    assert [graph.keys[n] for n in graph.closure(0)] == ["b", "a"]
+
+
+def test_edges_after_traversal():
+    """Test that edges added after a traversal are taken into account."""
+    graph = _graph([("a", "b")])
+    assert list(graph.successors(0)) == [1]
+    graph.add_edge("b", "c")
+    assert [graph.keys[n] for n in graph.closure(0)] == ["b", "c"]
+
+
+def test_large_graph():
+    """Test that a deep graph of 100k nodes is traversed quickly and without recursion."""
+    count = 100000
+    graph = DependencyGraph()
+    for i in range(count - 1):
+        graph.add_edge(i, i + 1)
+        graph.add_edge(i, (i * 7) % count)
+    start = time.monotonic()
+    assert len(graph.closure(0)) == count
+    assert time.monotonic() - start < 10
+
+
+def test_npm_shared_dependencies():
+    """Test that a package reachable through several paths is listed once."""
+    content = """{"dependencies": {
+        "a": {"version": "1", "dependencies": {
+            "b": {"version": "1", "dependencies": {"d": {"version": "1"}}},
+            "c": {"version": "1", "dependencies": {"d": {"version": "1"}}}}}}}"""
+    manifests = [{"filepath": "/", "filename": "npmlist.json", "content": content}]
+    res = NpmDependencyTreeGenerator().get_dependencies(manifests, True)
+    deps = res["result"][0]["details"][0]["_resolved"][0]["deps"]
+    assert [d["package"] for d in deps] == ["b", "d", "c"]
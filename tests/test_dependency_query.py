@@ -0,0 +1,72 @@
+"""Test f8a_utils.dependency_query module."""
+from pathlib import Path
+
+from f8a_utils.dependency_finder import DependencyFinder
+from f8a_utils.dependency_graph import DependencyGraph
+from f8a_utils.dependency_query import DependencyQuery
+
+
+def _query():
+    """Return the query of a small graph, module m has the direct dependencies a and b."""
+    graph = DependencyGraph()
+    for source, target in [("m", "a"), ("m", "b"), ("a", "c"), ("c", "d"), ("b", "d"),
+                           ("x", "d")]:
+        graph.add_edge(source, target)
+    graph.add_root("a")
+    graph.add_root("b")
+    return DependencyQuery(graph, lambda node: {"package": graph.keys[node], "version": "1"})
+
+
+def test_dependents():
+    """Test that only packages reachable from a direct dependency are dependents."""
+    query = _query()
+    assert [d["package"] for d in query.dependents("d")] == ["b", "c"]
+    assert [d["package"] for d in query.dependents("a")] == []
+    assert query.dependents("unknown") == []
+    assert "d" in query
+    assert "x" not in query
+    assert "m" not in query
+
+
+def test_direct_dependents():
+    """Test which direct dependencies pull in a package."""
+    query = _query()
+    assert [d["package"] for d in query.direct_dependents("d")] == ["a", "b"]
+    assert [d["package"] for d in query.direct_dependents("c")] == ["a"]
+    assert [d["package"] for d in query.direct_dependents("b")] == ["b"]
+
+
+def test_shortest_path():
+    """Test the shortest path from the nearest direct dependency."""
+    query = _query()
+    assert [d["package"] for d in query.shortest_path("d")] == ["b", "d"]
+    assert [d["package"] for d in query.shortest_path("c")] == ["a", "c"]
+    assert [d["package"] for d in query.shortest_path("a")] == ["a"]
+    assert query.shortest_path("d", version="2") is None
+    assert query.shortest_path("x") is None
+
+
+def test_dependency_query_maven():
+    """Test the query of a maven manifest, test dependencies are left out."""
+    content = open(str(Path(__file__).parent / "data/dependencies.txt"), "rb").read()
+    query = DependencyFinder.get_dependency_query("maven", content)
+    path = query.shortest_path("io.netty:netty-common")
+    assert [d["package"] for d in path] == ["io.vertx:vertx-core", "io.netty:netty-common"]
+    assert query.direct_dependents("io.netty:netty-common") == [
+        {"package": "io.vertx:vertx-core", "version": "3.5.4.redhat-00002"}]
+    assert "junit:junit" not in query
+
+
+def test_dependency_query_golang():
+    """Test the query of a go mod graph."""
+    content = open(str(Path(__file__).parent / "data/gograph.txt")).read()
+    query = DependencyFinder.get_dependency_query("golang", content)
+    path = query.shortest_path("golang.org/x/sys")
+    assert len(path) == 2
+    assert path[-1]["package"] == "golang.org/x/sys"
+    direct = {d["from"] for d in query.direct_dependents("golang.org/x/sys")}
+    tree = DependencyFinder.scan_and_find_dependencies(
+        "golang", [{"filepath": "/", "filename": "gograph.txt", "content": content}], True)
+    expected = {d["from"] for d in tree["result"][0]["details"][0]["_resolved"]
+                if any(t["package"] == "golang.org/x/sys" for t in d["deps"])}
+    assert direct == expected
@@ -0,0 +1,95 @@
+"""Test file for the GitHub api caches."""
+
+from multiprocessing import Process
+from unittest.mock import patch
+
+from f8a_utils import gh_cache
+from f8a_utils.gh_cache import CommitDateCache, ConditionalRequestCache, \
+    get_conditional_request_cache
+
+SHA = "0d4799964558b1e96587737613d6e79e1679cb82"
+
+
+def _write_entry(path):
+    """Write an entry from another process."""
+    CommitDateCache(path).set("kubernetes", "kubernetes", SHA, "tag", "2020-09-09T11:17:20Z")
+
+
+def test_commit_date_cache(tmp_path):
+    """Test CommitDateCache get and set."""
+    cache = CommitDateCache(str(tmp_path / "dates.db"))
+    assert cache.get("kubernetes", "kubernetes", SHA, "commit") is None
+    cache.set("kubernetes", "kubernetes", SHA, "commit", "2020-09-17T13:19:13Z")
+    cache.set("kubernetes", "kubernetes", SHA, "commit", "2021-01-01T00:00:00Z")
+    assert cache.get("Kubernetes", "Kubernetes", SHA.upper(), "commit") == "2020-09-17T13:19:13Z"
+    assert cache.get("kubernetes", "kubernetes", SHA, "tag") is None
+
+    # the cache file is shared with other processes
+    proc = Process(target=_write_entry, args=(cache.path,))
+    proc.start()
+    proc.join()
+    assert cache.get("kubernetes", "kubernetes", SHA, "tag") == "2020-09-09T11:17:20Z"
+    assert CommitDateCache(cache.path).get(
+        "kubernetes", "kubernetes", SHA, "commit") == "2020-09-17T13:19:13Z"
+
+
+def test_commit_date_cache_is_cacheable():
+    """Test that only full shas are cached."""
+    assert CommitDateCache.is_cacheable(SHA)
+    assert not CommitDateCache.is_cacheable(SHA[:12])
+    assert not CommitDateCache.is_cacheable("v1.19.1")
+    assert not CommitDateCache.is_cacheable(None)
+
+
+def test_commit_date_cache_unusable_path(tmp_path):
+    """Test that errors of the cache are treated as misses."""
+    cache = CommitDateCache(str(tmp_path))
+    cache.set("kubernetes", "kubernetes", SHA, "commit", "2020-09-17T13:19:13Z")
+    assert cache.get("kubernetes", "kubernetes", SHA, "commit") is None
+
+
+def _check_conditional_request_cache(cache):
+    """Check the behaviour shared by the memory and SQLite storages."""
+    url = "https://api.github.com/repos/o/n/git/refs/tags/v1"
+    assert cache.validators(url) == {}
+    cache.store(url, {}, '{"sha": "abc"}')
+    assert cache.validators(url) == {}
+    cache.store(url, {'ETag': '"v1"', 'Last-Modified': 'Thu, 17 Sep 2020 13:19:13 GMT'},
+                '{"sha": "abc"}')
+    assert cache.validators(url) == {'If-None-Match': '"v1"',
+                                     'If-Modified-Since': 'Thu, 17 Sep 2020 13:19:13 GMT'}
+    assert cache.get_not_modified(url) == {"sha": "abc"}
+    assert cache.get_not_modified(url + "/missing") is None
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'not_modified': 2}
+
+
+def test_conditional_request_cache_memory():
+    """Test ConditionalRequestCache kept in memory."""
+    _check_conditional_request_cache(ConditionalRequestCache())
+
+
+def test_conditional_request_cache_sqlite(tmp_path):
+    """Test ConditionalRequestCache persisted in SQLite."""
+    path = str(tmp_path / "http.db")
+    _check_conditional_request_cache(ConditionalRequestCache(path))
+    url = "https://api.github.com/repos/o/n/git/refs/tags/v1"
+    assert ConditionalRequestCache(path).validators(url)['If-None-Match'] == '"v1"'
+
+
+def test_conditional_request_cache_sqlite_bounded(tmp_path):
+    """Test that the SQLite storage keeps only the most recently stored responses."""
+    cache = ConditionalRequestCache(str(tmp_path / "http.db"))
+    with patch.object(gh_cache, "MEMORY_CACHE_SIZE", 3):
+        for i in range(5):
+            cache.store("https://api.github.com/{}".format(i), {'ETag': '"v1"'}, '{}')
+        cache.store("https://api.github.com/2", {'ETag': '"v2"'}, '{}')
+    assert [bool(cache.validators("https://api.github.com/{}".format(i)))
+            for i in range(5)] == [False, False, True, True, True]
+    assert cache.validators("https://api.github.com/2") == {'If-None-Match': '"v2"'}
+
+
+def test_get_conditional_request_cache(tmp_path):
+    """Test that caches are shared per path."""
+    path = str(tmp_path / "http.db")
+    assert get_conditional_request_cache(path) is get_conditional_request_cache(path)
+    assert get_conditional_request_cache('') is not get_conditional_request_cache(path)
@@ -0,0 +1,81 @@
+"""Test file for the GitHub token pool."""
+
+import time
+from email.utils import formatdate
+
+from f8a_utils.gh_token_pool import GithubTokenPool, get_token_pool
+
+
+def _headers(remaining, reset, resource='core'):
+    """Return rate limit headers."""
+    return {'X-RateLimit-Limit': '5000',
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(reset),
+            'X-RateLimit-Resource': resource}
+
+
+def test_select_most_headroom():
+    """Test that the token with the most remaining quota is selected."""
+    reset = time.time() + 600
+    pool = GithubTokenPool(['a', 'b', 'c', ''])
+    assert pool.tokens == ['a', 'b', 'c']
+    pool.update('a', _headers(10, reset), 200)
+    pool.update('b', _headers(300, reset), 200)
+    pool.update('c', _headers(200, reset), 200)
+    assert pool.select() == 'b'
+    assert pool.stats()['...b']['core']['remaining'] == 299
+
+    # quotas are tracked per resource
+    pool.update('b', _headers(1, reset, 'graphql'), 200)
+    pool.update('c', _headers(0, reset, 'graphql'), 200)
+    assert pool.select('graphql') == 'a'
+
+
+def test_parked_tokens():
+    """Test that exhausted tokens are parked until reset."""
+    pool = GithubTokenPool(['a', 'b'])
+    pool.update('a', _headers(0, time.time() + 600), 403)
+    pool.update('b', _headers(0, time.time() + 60), 403)
+    # all tokens exhausted, pick the one reset first
+    assert pool.select() == 'b'
+    assert pool.stats()['...a']['core']['parked'] is True
+
+    # reset time has passed, the quota is available again
+    pool.update('a', _headers(0, time.time() - 1), 403)
+    assert pool.select() == 'a'
+    assert pool.stats()['...a']['core']['parked'] is False
+
+
+def test_secondary_rate_limit():
+    """Test that Retry-After parks the token."""
+    pool = GithubTokenPool(['a', 'b'])
+    pool.update('a', {'Retry-After': '60'}, 403)
+    pool.update('b', {}, 200)
+    assert pool.stats()['...a']['core']['parked'] is True
+    assert pool.stats()['...b'] == {}
+    assert pool.select() == 'b'
+
+
+def test_retry_after_http_date():
+    """Test that Retry-After is also accepted as HTTP-date and ignored when invalid."""
+    pool = GithubTokenPool(['a', 'b'])
+    pool.update('a', {'Retry-After': formatdate(time.time() + 60, usegmt=True)}, 429)
+    assert pool.stats()['...a']['core']['parked'] is True
+    pool.update('b', {'Retry-After': 'soon'}, 429)
+    assert pool.stats()['...b'] == {}
+    pool.update('b', dict(_headers(10, time.time() + 60), **{'Retry-After': 'soon'}), 403)
+    assert pool.stats()['...b']['core']['parked'] is False
+
+
+def test_empty_pool():
+    """Test the pool without tokens."""
+    pool = GithubTokenPool([''])
+    assert pool.select() is None
+    pool.update('x', _headers(1, time.time()), 200)
+    assert pool.stats() == {}
+
+
+def test_get_token_pool():
+    """Test that pools are shared for the same tokens."""
+    assert get_token_pool(['x', 'y']) is get_token_pool(['x', 'y'])
+    assert get_token_pool(['x', 'y']) is not get_token_pool(['y'])
@@ -1,8 +1,13 @@
 """Test file for all the github utils functions."""
 
-from f8a_utils.gh_utils import GithubUtils
+from f8a_utils.gh_utils import GithubUtils, parse_pseudo_version
+from f8a_utils.gh_cache import CommitDateCache, ConditionalRequestCache
+from f8a_utils.date_rules import compile_date_rule
+from f8a_utils.retry_policy import RetryPolicy
 from unittest.mock import patch
 import os
+import json
+import time
 
 
 def test_get_hash_from_semver():
@@ -108,3 +113,221 @@ def test_is_commit_date_in_vuln_range():
     assert res is True
     res = gh._is_commit_date_in_vuln_range("0d4799964558", "*")
     assert res is None
+
+
+def test_parse_pseudo_version():
+    """Test parse_pseudo_version."""
+    assert parse_pseudo_version("v0.0.0-20200917131913-abcdef123456") == \
+        ("2020-09-17T13:19:13Z", "abcdef123456")
+    assert parse_pseudo_version("v1.2.4-0.20200917131913-abcdef123456") == \
+        ("2020-09-17T13:19:13Z", "abcdef123456")
+    assert parse_pseudo_version("v1.2.3-pre.0.20200917131913-abcdef123456+incompatible") == \
+        ("2020-09-17T13:19:13Z", "abcdef123456")
+    assert parse_pseudo_version("v1.19.1") is None
+    # only vX.0.0 takes the timestamp right after the dash
+    assert parse_pseudo_version("v1.2.3-20200917131913-abcdef123456") is None
+    # a prerelease needs .0. before the timestamp
+    assert parse_pseudo_version("v1.2.3-pre.20200917131913-abcdef123456") is None
+    assert parse_pseudo_version("v1.2.3-rc1.20200917131913-abcdef123456") is None
+    assert parse_pseudo_version("0.0.0-20200917131913-abcdef123456") is None
+    assert parse_pseudo_version("v0.0.0-20201317131913-abcdef123456") is None
+    assert parse_pseudo_version("") is None
+    assert parse_pseudo_version(None) is None
+
+
+@patch("requests.get")
+def test_pseudo_version_needs_no_api_call(mock_get):
+    """Test that pseudo-versions are resolved locally."""
+    gh = GithubUtils()
+    dt = gh._get_commit_date("kubernetes", "kubernetes", "v0.0.0-20200917131913-0d4799964558")
+    assert dt == "2020-09-17T13:19:13Z"
+    res = gh._is_commit_in_vuln_range("kubernetes", "kubernetes",
+                                      "v0.0.0-20200917131913-0d4799964558",
+                                      ">#2020-09-15T13:19:13Z&<=#2020-09-16T13:19:13Z,"
+                                      "=#2020-09-17T13:19:13Z")
+    assert res is True
+    mock_get.assert_not_called()
+
+
+class JsonResponse:
+    """Mock the HTTP response of the GitHub api."""
+
+    def __init__(self, status_code, payload, headers=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = headers or {}
+        self.text = json.dumps(payload)
+
+    def json(self):
+        """Return the payload."""
+        return self.payload
+
+
+@patch.object(GithubUtils, "_get_commit_date", return_value="2020-01-01T00:00:00Z")
+@patch("requests.post")
+def test_get_commit_dates(mock_post, mock_rest):
+    """Test _get_commit_dates."""
+    mock_post.return_value = JsonResponse(200, {
+        "data": {
+            "r0": {"object": {"tagger": {"date": "2020-09-09T13:17:20+02:00"}, "target": {}}},
+            "r1": {"object": {"committedDate": "2020-09-17T13:19:13Z"}},
+            "r2": None
+        },
+        "errors": [{"type": "NOT_FOUND"}]
+    })
+    gh = GithubUtils()
+    items = [("kubernetes", "kubernetes", "v1.19.1"),
+             ("kubernetes", "kubernetes", "0d4799964558b1e96587737613d6e79e1679cb82"),
+             ("wiuroruw", "gshfkjlsdjkh", "v1.19.1"),
+             ("kubernetes", "kubernetes", "v0.0.0-20200917131913-0d4799964558"),
+             ("", "kubernetes", "v1.19.1")]
+    dates = gh._get_commit_dates(items)
+    assert dates == {
+        items[0]: "2020-09-09T11:17:20Z",
+        items[1]: "2020-09-17T13:19:13Z",
+        items[2]: "2020-01-01T00:00:00Z",
+        items[3]: "2020-09-17T13:19:13Z",
+        items[4]: None
+    }
+    assert mock_post.call_count == 1
+    variables = mock_post.call_args[1]['json']['variables']
+    assert variables['e0'] == "refs/tags/v1.19.1"
+    assert variables['e1'] == "0d4799964558b1e96587737613d6e79e1679cb82"
+    mock_rest.assert_called_once_with("wiuroruw", "gshfkjlsdjkh", "v1.19.1")
+
+    mock_post.return_value = JsonResponse(502, {})
+    gh.retry_policy = RetryPolicy(max_attempts=2, min_wait=0.01)
+    dates = gh._get_commit_dates(items[:1], rest_fallback=False)
+    assert dates == {items[0]: None}
+
+
+@patch("requests.get")
+def test_commit_date_cache(mock_get, tmp_path):
+    """Test that the dates of full shas are served from the cache."""
+    sha = "0d4799964558b1e96587737613d6e79e1679cb82"
+    mock_get.return_value = JsonResponse(200, {
+        "commit": {"committer": {"date": "2020-09-17T13:19:13Z"}}})
+    gh = GithubUtils()
+    gh.commit_date_cache = CommitDateCache(str(tmp_path / "dates.db"))
+    assert gh._get_date_from_commit_sha("kubernetes", "kubernetes", sha) == "2020-09-17T13:19:13Z"
+    assert gh._get_date_from_commit_sha("kubernetes", "kubernetes", sha) == "2020-09-17T13:19:13Z"
+    assert mock_get.call_count == 1
+
+    mock_get.return_value = JsonResponse(200, {"tagger": {"date": "2020-09-09T11:17:20Z"}})
+    assert gh._get_date_from_tag_sha("kubernetes", "kubernetes", sha) == "2020-09-09T11:17:20Z"
+    assert gh._get_date_from_tag_sha("kubernetes", "kubernetes", sha) == "2020-09-09T11:17:20Z"
+    assert mock_get.call_count == 2
+
+    # short shas are not cached
+    gh._get_date_from_commit_sha("kubernetes", "kubernetes", sha[:12])
+    gh._get_date_from_commit_sha("kubernetes", "kubernetes", sha[:12])
+    assert mock_get.call_count == 4
+
+
+@patch.dict(os.environ, {'GITHUB_TOKEN': 'token-aaaa,token-bbbb'})
+@patch("requests.get")
+def test_token_selection_by_rate_limit(mock_get):
+    """Test that exhausted gh tokens are not used until reset."""
+    reset = str(int(time.time()) + 600)
+    mock_get.return_value = JsonResponse(403, {}, {
+        'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': reset})
+    gh = GithubUtils()
+    gh._get_hash_from_semver("kubernetes", "kubernetes", "v1.19.1")
+    exhausted = mock_get.call_args[1]['headers']['Authorization']
+
+    mock_get.return_value = JsonResponse(200, {"object": {"sha": "abc"}}, {
+        'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '4000', 'X-RateLimit-Reset': reset})
+    for _ in range(5):
+        assert gh._get_hash_from_semver("kubernetes", "kubernetes", "v1.19.1") == "abc"
+        assert mock_get.call_args[1]['headers']['Authorization'] != exhausted
+
+    stats = GithubUtils().get_token_stats()
+    assert sorted(stats) == ['...aaaa', '...bbbb']
+    assert sorted(s['core']['parked'] for s in stats.values()) == [False, True]
+
+
+@patch("requests.get")
+def test_get_hash_from_semver_with_tag_listing(mock_get):
+    """Test resolving versions from the listing of all tags."""
+    first_page = [{"ref": "refs/tags/v{}".format(i), "object": {"sha": "sha{}".format(i)}}
+                  for i in range(100)]
+    second_page = [{"ref": "refs/tags/v1.19.1", "object": {"sha": "abc"}}]
+    mock_get.side_effect = [JsonResponse(200, first_page), JsonResponse(200, second_page)]
+    gh = GithubUtils(use_tag_listing=True)
+    assert gh._get_hash_from_semver("listing", "repo", "v1.19.1") == "abc"
+    assert gh._get_hash_from_semver("listing", "repo", "v42") == "sha42"
+    assert mock_get.call_count == 2
+    assert "matching-refs/tags?per_page=100&page=2" in mock_get.call_args[0][0]
+
+    # tags missing from the cached listing are looked up one by one
+    mock_get.side_effect = [JsonResponse(404, {}), JsonResponse(200, {"object": {"sha": "new"}})]
+    assert gh._get_hash_from_semver("Listing", "Repo", "v1.99.9") is None
+    assert gh._get_hash_from_semver("listing", "repo", "v2.0.0") == "new"
+    assert mock_get.call_count == 4
+    assert mock_get.call_args[0][0].endswith("git/refs/tags/v2.0.0")
+
+
+@patch("requests.get")
+def test_tag_listing_ignoring_pages(mock_get):
+    """Test that the listing stops when a page brings no new tags."""
+    refs = [{"ref": "refs/tags/v{}".format(i), "object": {"sha": "sha{}".format(i)}}
+            for i in range(150)]
+    mock_get.return_value = JsonResponse(200, refs)
+    gh = GithubUtils(use_tag_listing=True)
+    assert gh._get_hash_from_semver("unpaged", "repo", "v120") == "sha120"
+    assert mock_get.call_count == 2
+
+
+@patch("requests.get")
+def test_get_hash_from_semver_with_failed_tag_listing(mock_get):
+    """Test fallback to the ref lookup when the tags can't be listed."""
+    mock_get.side_effect = [JsonResponse(404, {}),
+                            JsonResponse(200, {"object": {"sha": "abc"}})]
+    gh = GithubUtils(use_tag_listing=True)
+    assert gh._get_hash_from_semver("unlisted", "repo", "v1.19.1") == "abc"
+    assert mock_get.call_args[0][0].endswith("git/refs/tags/v1.19.1")
+
+
+def test_is_commit_date_in_compiled_vuln_range():
+    """Test _is_commit_date_in_vuln_range with compiled rules."""
+    gh = GithubUtils()
+    rule = compile_date_rule(">#2020-09-15T13:19:13Z&<=#2020-09-16T13:19:13Z")
+    assert gh._is_commit_date_in_vuln_range("20200916101010", rule) is True
+    assert gh._is_commit_date_in_vuln_range("20200917101010", rule) is False
+
+
+def test_are_commit_dates_in_vuln_ranges():
+    """Test _are_commit_dates_in_vuln_ranges."""
+    gh = GithubUtils()
+    res = gh._are_commit_dates_in_vuln_ranges(
+        ["20200916101010", "0d4799964558"],
+        [">#2020-09-15T13:19:13Z&<=#2020-09-16T13:19:13Z", "*"])
+    assert res == [[True, True], None]
+
+
+@patch("requests.get")
+def test_conditional_requests(mock_get):
+    """Test that cached validators are sent and 304 responses are served from the cache."""
+    gh = GithubUtils()
+    gh.http_cache = ConditionalRequestCache()
+    mock_get.return_value = JsonResponse(200, {"object": {"sha": "abc"}}, {"ETag": '"v1"'})
+    assert gh._get_hash_from_semver("etag", "repo", "v1.19.1") == "abc"
+    assert 'If-None-Match' not in mock_get.call_args[1]['headers']
+
+    mock_get.return_value = JsonResponse(304, None)
+    assert gh._get_hash_from_semver("etag", "repo", "v1.19.1") == "abc"
+    assert mock_get.call_args[1]['headers']['If-None-Match'] == '"v1"'
+    assert gh.get_http_cache_stats() == {'hits': 1, 'misses': 1, 'not_modified': 1}
+
+
+@patch("requests.get")
+def test_conditional_request_evicted(mock_get):
+    """Test that a 304 without a cached body is followed by an unconditional request."""
+    gh = GithubUtils()
+    gh.http_cache = ConditionalRequestCache()
+    gh.http_cache.validators = lambda url: {'If-None-Match': '"v1"'}
+    mock_get.side_effect = [JsonResponse(304, None),
+                            JsonResponse(200, {"object": {"sha": "abc"}}, {"ETag": '"v2"'})]
+    assert gh._get_hash_from_semver("evicted", "repo", "v1.19.1") == "abc"
+    assert mock_get.call_count == 2
+    assert 'If-None-Match' not in mock_get.call_args[1]['headers']
@@ -0,0 +1,128 @@
+"""Test file for the asyncio github utils, against a local stub server."""
+
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from f8a_utils.gh_utils_async import AsyncGithubUtils
+from f8a_utils.retry_policy import RetryPolicy
+
+SHA = "0d4799964558b1e96587737613d6e79e1679cb82"
+TAG_SHA = "95b5b7d61338aa0f4c601e820e1d8f3e45696bbc"
+
+
+def _stub_app(requests):
+    """Return a stub of the GitHub api recording the requested paths."""
+    async def ref(request):
+        requests.append(request.path)
+        tag = request.match_info['tag']
+        if tag == 'flaky' and requests.count(request.path) == 1:
+            return web.json_response({}, status=502)
+        if tag == 'slow':
+            await asyncio.sleep(2)
+        if tag not in ('v1.19.1', 'flaky', 'slow'):
+            return web.json_response({}, status=404)
+        return web.json_response({"object": {"sha": TAG_SHA}})
+
+    async def commit(request):
+        requests.append(request.path)
+        await asyncio.sleep(0.1)
+        if request.match_info['sha'] != SHA:
+            return web.json_response({}, status=404)
+        return web.json_response({"commit": {"committer": {"date": "2020-09-17T13:19:13Z"}}})
+
+    async def tag(request):
+        requests.append(request.path)
+        if request.match_info['sha'] != TAG_SHA:
+            return web.json_response({}, status=404)
+        return web.json_response({"tagger": {"date": "2020-09-09T11:17:20Z"}})
+
+    app = web.Application()
+    app.router.add_get('/repos/{org}/{name}/git/refs/tags/{tag}', ref)
+    app.router.add_get('/repos/{org}/{name}/commits/{sha}', commit)
+    app.router.add_get('/repos/{org}/{name}/git/tags/{sha}', tag)
+    return app
+
+
+def _run(scenario):
+    """Run the scenario coroutine against the stub server."""
+    async def main():
+        requests = []
+        runner = web.AppRunner(_stub_app(requests))
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            async with AsyncGithubUtils(max_concurrency=4,
+                                        api_url="http://127.0.0.1:{}/".format(port)) as gh:
+                return await scenario(gh, requests)
+        finally:
+            await runner.cleanup()
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+def test_get_commit_date():
+    """Test _get_commit_date for tags, hashes and pseudo-versions."""
+    async def scenario(gh, requests):
+        assert await gh._get_commit_date("kubernetes", "kubernetes", "v1.19.1") == \
+            "2020-09-09T11:17:20Z"
+        assert await gh._get_commit_date("kubernetes", "kubernetes", SHA) == \
+            "2020-09-17T13:19:13Z"
+        assert await gh._get_commit_date("kubernetes", "kubernetes", "v9.9.9") is None
+        count = len(requests)
+        assert await gh._get_commit_date(
+            "kubernetes", "kubernetes", "v0.0.0-20200917131913-0d4799964558") == \
+            "2020-09-17T13:19:13Z"
+        assert len(requests) == count
+        assert await gh._get_hash_from_semver("", "kubernetes", "v1.19.1") is None
+    _run(scenario)
+
+
+def test_get_commit_dates_concurrently():
+    """Test that many dates are resolved concurrently."""
+    async def scenario(gh, requests):
+        loop = asyncio.get_event_loop()
+        items = [("kubernetes", "repo{}".format(i), SHA) for i in range(8)]
+        start = loop.time()
+        dates = await gh._get_commit_dates(items + items)
+        # 8 requests of 0.1s with 4 connections
+        assert loop.time() - start < 0.6
+        assert dates == {item: "2020-09-17T13:19:13Z" for item in items}
+    _run(scenario)
+
+
+def test_is_commit_in_vuln_range():
+    """Test _is_commit_in_vuln_range and _is_commit_date_in_vuln_range."""
+    async def scenario(gh, requests):
+        rules = ">#2020-09-15T13:19:13Z&<=#2020-09-16T13:19:13Z,=#2020-09-17T13:19:13Z"
+        assert await gh._is_commit_in_vuln_range("kubernetes", "kubernetes", SHA, rules) is True
+        assert await gh._is_commit_in_vuln_range("kubernetes", "kubernetes", TAG_SHA,
+                                                 rules) is False
+        assert await gh._is_commit_in_vuln_range("kubernetes", "kubernetes", "bad", "*") is None
+        assert gh._is_commit_date_in_vuln_range("20200916101010", rules) is True
+        assert gh._is_commit_date_in_vuln_range("bad", rules) is None
+        assert gh.get_token_stats() is not None
+        assert set(gh.get_http_cache_stats()) == {'hits', 'misses', 'not_modified'}
+    _run(scenario)
+
+
+def test_retries_and_timeout():
+    """Test that requests are retried and time out within the budget of the retry policy."""
+    async def scenario(gh, requests):
+        gh.retry_policy = RetryPolicy(budget=0.5, max_attempts=3, min_wait=0.01)
+        assert await gh._get_hash_from_semver("kubernetes", "kubernetes", "flaky") == TAG_SHA
+        assert requests.count("/repos/kubernetes/kubernetes/git/refs/tags/flaky") == 2
+
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        with pytest.raises(asyncio.TimeoutError):
+            await gh._get_hash_from_semver("kubernetes", "kubernetes", "slow")
+        assert loop.time() - start < 1.5
+    _run(scenario)
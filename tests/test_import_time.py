@@ -0,0 +1,48 @@
+"""Guard the import time of f8a_utils against heavy third-party imports."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ('requests', 'lxml', 'bs4', 'cryptography', 'tenacity', 'semver',
+                 'f8a_version_comparator', 'asyncio', 'aiohttp')
+
+# Cumulative import time budget of the module in microseconds, as reported by -X importtime.
+# Timings depend on the machine, so the budget is only checked when set in the environment.
+IMPORT_TIME_BUDGET = os.getenv('F8A_IMPORT_TIME_BUDGET')
+
+
+def _import(module, measure=False):
+    """Import the module in a fresh interpreter, return its heavy modules and import time."""
+    code = 'import sys, {m}; print(",".join(k for k in {h!r} if k in sys.modules))'.format(
+        m=module, h=HEAVY_MODULES)
+    options = ['-X', 'importtime'] if measure else []
+    proc = subprocess.run([sys.executable] + options + ['-c', code],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+    loaded = [m for m in proc.stdout.strip().split(',') if m]
+    import_time = None
+    for line in proc.stderr.splitlines():
+        fields = [f.strip() for f in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            import_time = int(fields[1])
+    return loaded, import_time
+
+
+@pytest.mark.parametrize('module', ['f8a_utils.dependency_finder', 'f8a_utils.versions',
+                                    'f8a_utils.user_token_utils', 'f8a_utils.gh_utils',
+                                    'f8a_utils.golang_utils', 'f8a_utils.commands'])
+def test_no_heavy_imports(module):
+    """Test that heavy dependencies are only imported on first use."""
+    loaded, _ = _import(module)
+    assert loaded == []
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime needs Python 3.7')
+@pytest.mark.skipif(IMPORT_TIME_BUDGET is None, reason='F8A_IMPORT_TIME_BUDGET is not set')
+def test_dependency_finder_import_time():
+    """Test that importing DependencyFinder stays within its time budget."""
+    # best of a few runs, to be robust against a busy machine
+    best = min(_import('f8a_utils.dependency_finder', measure=True)[1] for _ in range(3))
+    assert best < int(IMPORT_TIME_BUDGET)
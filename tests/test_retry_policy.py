@@ -0,0 +1,91 @@
+"""Test f8a_utils.retry_policy module."""
+import asyncio
+import time
+from unittest.mock import patch
+from urllib.error import HTTPError, URLError
+
+import pytest
+import requests
+
+from f8a_utils.retry_policy import RetryPolicy
+
+
+class HttpResponse:
+    """Mock the HTTP response that does not contain any payload."""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+@patch("requests.get")
+def test_retry_on_server_errors(mock_get):
+    """Test that 5xx responses are retried and the timeout is the remaining budget."""
+    mock_get.side_effect = [HttpResponse(503), HttpResponse(200)]
+    policy = RetryPolicy(budget=10, max_attempts=3, min_wait=0.01)
+    assert policy.get("https://example.com", headers={"a": "b"}).status_code == 200
+    assert mock_get.call_count == 2
+    timeout = mock_get.call_args[1]["timeout"]
+    assert 0 < timeout <= 10
+    assert mock_get.call_args[1]["headers"] == {"a": "b"}
+
+
+@patch("requests.get", return_value=HttpResponse(404))
+def test_no_retry_on_client_errors(mock_get):
+    """Test that definitive answers are returned right away."""
+    assert RetryPolicy(min_wait=0.01).get("https://example.com").status_code == 404
+    assert mock_get.call_count == 1
+
+
+@patch("requests.post", return_value=HttpResponse(502))
+def test_last_response_returned_after_attempts(mock_post):
+    """Test that the last response is returned once the attempts are spent."""
+    policy = RetryPolicy(max_attempts=3, min_wait=0.01)
+    assert policy.post("https://example.com", json={}).status_code == 502
+    assert mock_post.call_count == 3
+
+
+@patch("requests.get", side_effect=requests.ConnectionError("down"))
+def test_budget_bounds_retries(mock_get):
+    """Test that no retry is made once the wait would exceed the budget."""
+    policy = RetryPolicy(budget=1, max_attempts=100, min_wait=0.2, max_wait=0.2)
+    start = time.monotonic()
+    with pytest.raises(requests.ConnectionError):
+        policy.get("https://example.com")
+    assert time.monotonic() - start < 1.5
+    assert 2 <= mock_get.call_count <= 5
+
+
+def test_urlopen_errors():
+    """Test which urllib errors are retried."""
+    policy = RetryPolicy(max_attempts=2, min_wait=0.01)
+    with patch("urllib.request.urlopen",
+               side_effect=HTTPError("u", 404, "Not Found", {}, None)) as mock_open:
+        with pytest.raises(HTTPError):
+            policy.urlopen("https://example.com")
+        assert mock_open.call_count == 1
+    with patch("urllib.request.urlopen", side_effect=URLError("down")) as mock_open:
+        with pytest.raises(URLError):
+            policy.urlopen("https://example.com")
+        assert mock_open.call_count == 2
+
+
+def test_run_async():
+    """Test that coroutines are retried on errors and responses like synchronous calls."""
+    outcomes = [ConnectionRefusedError(), HttpResponse(503), HttpResponse(200)]
+    timeouts = []
+
+    async def attempt(timeout):
+        timeouts.append(timeout)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    policy = RetryPolicy(budget=10, max_attempts=3, min_wait=0.01)
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(policy.run_async(attempt)).status_code == 200
+    finally:
+        loop.close()
+    assert len(timeouts) == 3
+    assert all(0 < timeout <= 10 for timeout in timeouts)
@@ -0,0 +1,70 @@
+"""Test f8a_utils.serializer module."""
+import gzip
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from f8a_utils import serializer
+from f8a_utils.dependency_finder import DependencyFinder
+
+BACKENDS = ["json"] + (["orjson"] if serializer.get_backend() == "orjson" else [])
+
+
+def _golang_result():
+    """Return the dependency finder result of the golang test data."""
+    manifests = [{
+        "filename": "gograph.txt",
+        "filepath": "/bin/local",
+        "content": open(str(Path(__file__).parent / "data/gograph.txt")).read()
+    }]
+    return DependencyFinder().scan_and_find_dependencies("golang", manifests, True)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_dumps(backend):
+    """Test that the output is compact and round trips."""
+    obj = {"a": [1, 2.5, None, True], "b": {"c": "ü"}, "d": [], "e": {}}
+    out = serializer.dumps(obj, backend=backend)
+    assert out == '{"a":[1,2.5,null,true],"b":{"c":"ü"},"d":[],"e":{}}'
+    assert json.loads(out) == obj
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_dump_text_and_binary(backend):
+    """Test that streamed output equals dumps() for text and binary files."""
+    result = _golang_result()
+    expected = serializer.dumps(result, backend=backend)
+
+    text = io.StringIO()
+    serializer.dump(result, text, backend=backend)
+    assert text.getvalue() == expected
+
+    binary = io.BytesIO()
+    serializer.dump(result, binary, backend=backend, stream_depth=2)
+    assert binary.getvalue() == expected.encode()
+    assert json.loads(expected) == result
+
+
+def test_dump_to_file(tmp_path):
+    """Test dumping to files opened in text and binary mode."""
+    obj = {"result": [{"details": [{"_resolved": [{"package": "a", "deps": []}]}]}]}
+    with open(str(tmp_path / "t.json"), "w") as fp:
+        serializer.dump(obj, fp)
+    with open(str(tmp_path / "b.json"), "wb") as fp:
+        serializer.dump(obj, fp)
+    for name in ("t.json", "b.json"):
+        assert json.loads((tmp_path / name).read_text()) == obj
+
+
+def test_dump_to_gzip_file(tmp_path):
+    """Test dumping to gzip files, GzipFile has an int mode attribute."""
+    obj = {"result": [{"details": [{"_resolved": [{"package": "a", "deps": []}]}]}]}
+    with gzip.GzipFile(str(tmp_path / "b.json.gz"), "wb") as fp:
+        serializer.dump(obj, fp)
+    with gzip.open(str(tmp_path / "t.json.gz"), "wt") as fp:
+        serializer.dump(obj, fp)
+    for name in ("b.json.gz", "t.json.gz"):
+        with gzip.open(str(tmp_path / name), "rt") as fp:
+            assert json.load(fp) == obj
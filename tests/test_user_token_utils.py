@@ -2,6 +2,8 @@
 from unittest.mock import patch
 import unittest
 
+from cryptography.fernet import Fernet
+
 import f8a_utils.user_token_utils as snyk_utils
 
 
@@ -15,11 +17,17 @@ class HttpResponse:
 
 resp_200 = HttpResponse(200, '')
 resp_400 = HttpResponse(400, '')
+resp_401 = HttpResponse(401, '')
+resp_503 = HttpResponse(503, '')
 
 
 class TestSynkToken(unittest.TestCase):
     """Test cases for checking validity of Snyk Token."""
 
+    def setUp(self):
+        """Start every test with an empty validation cache."""
+        snyk_utils.clear_snyk_token_cache()
+
     @patch("requests.post")
     def test_is_valid_snyk_token(self, mock1):
         """Check for valid token."""
@@ -31,3 +39,73 @@ class TestSynkToken(unittest.TestCase):
         """Check for invalid token."""
         mock1.return_value = resp_400
         self.assertFalse(snyk_utils.is_snyk_token_valid("invalid_snyk_token"))
+
+    @patch("requests.post", return_value=resp_200)
+    def test_snyk_token_validation_cached(self, mock1):
+        """Check that validations are cached and can be refreshed."""
+        self.assertTrue(snyk_utils.is_snyk_token_valid("valid_snyk_token"))
+        self.assertTrue(snyk_utils.is_snyk_token_valid("valid_snyk_token"))
+        self.assertEqual(mock1.call_count, 1)
+
+        mock1.return_value = resp_401
+        self.assertFalse(snyk_utils.is_snyk_token_valid("valid_snyk_token", force_refresh=True))
+        self.assertFalse(snyk_utils.is_snyk_token_valid("valid_snyk_token"))
+        self.assertEqual(mock1.call_count, 2)
+
+    @patch("requests.post", return_value=resp_401)
+    def test_snyk_token_validation_expiry(self, mock1):
+        """Check that cached invalid results expire after their TTL."""
+        with patch.object(snyk_utils, "SNYK_TOKEN_INVALID_TTL", 0):
+            self.assertFalse(snyk_utils.is_snyk_token_valid("invalid_snyk_token"))
+            self.assertFalse(snyk_utils.is_snyk_token_valid("invalid_snyk_token"))
+        self.assertEqual(mock1.call_count, 2)
+
+    @patch("requests.post", return_value=resp_400)
+    def test_snyk_token_validation_not_definitive(self, mock1):
+        """Check that responses not stating the token is invalid aren't cached."""
+        self.assertFalse(snyk_utils.is_snyk_token_valid("snyk_token"))
+        self.assertFalse(snyk_utils.is_snyk_token_valid("snyk_token"))
+        self.assertEqual(mock1.call_count, 2)
+
+        with patch.object(snyk_utils, "SNYK_RETRY_POLICY",
+                          snyk_utils.RetryPolicy(max_attempts=2, min_wait=0.01)):
+            mock1.return_value = resp_503
+            self.assertFalse(snyk_utils.is_snyk_token_valid("snyk_token"))
+            mock1.return_value = resp_200
+            self.assertTrue(snyk_utils.is_snyk_token_valid("snyk_token"))
+        self.assertEqual(mock1.call_count, 5)
+
+
+class TestApiTokenEncryption(unittest.TestCase):
+    """Test cases for encryption of Api Tokens."""
+
+    old_key = Fernet.generate_key().decode()
+    new_key = Fernet.generate_key().decode()
+
+    def test_encrypt_decrypt(self):
+        """Check the round trip and that the cipher is reused."""
+        with patch.object(snyk_utils, "ENCRYPTION_KEY_FOR_SNYK_TOKEN", self.new_key):
+            encrypted = snyk_utils.encrypt_api_token("token")
+            self.assertEqual(snyk_utils.decrypt_api_token(encrypted.decode()), b"token")
+            self.assertIs(snyk_utils.get_cipher(), snyk_utils.get_cipher())
+
+    def test_bulk_encrypt_decrypt(self):
+        """Check bulk functions keep the order with and without a thread pool."""
+        tokens = ["token-{}".format(i) for i in range(50)]
+        with patch.object(snyk_utils, "ENCRYPTION_KEY_FOR_SNYK_TOKEN", self.new_key):
+            encrypted = [t.decode() for t in snyk_utils.encrypt_api_tokens(tokens, max_workers=4)]
+            decrypted = snyk_utils.decrypt_api_tokens(encrypted)
+            self.assertEqual(decrypted, [t.encode() for t in tokens])
+            decrypted = snyk_utils.decrypt_api_tokens(encrypted, max_workers=4)
+            self.assertEqual(decrypted, [t.encode() for t in tokens])
+
+    def test_key_rotation(self):
+        """Check tokens encrypted with an old key still decrypt and can be rotated."""
+        with patch.object(snyk_utils, "ENCRYPTION_KEY_FOR_SNYK_TOKEN", self.old_key):
+            encrypted = snyk_utils.encrypt_api_token("token").decode()
+        keys = "{},{}".format(self.new_key, self.old_key)
+        with patch.object(snyk_utils, "ENCRYPTION_KEY_FOR_SNYK_TOKEN", keys):
+            self.assertEqual(snyk_utils.decrypt_api_token(encrypted), b"token")
+            rotated = snyk_utils.rotate_api_token(encrypted).decode()
+        with patch.object(snyk_utils, "ENCRYPTION_KEY_FOR_SNYK_TOKEN", self.new_key):
+            self.assertEqual(snyk_utils.decrypt_api_token(rotated), b"token")
@@ -118,13 +118,13 @@ class _response_json_value_error:
         raise ValueError(self.text)
 
 
-def mocked_requests_get_no_json(url):
+def mocked_requests_get_no_json(url, **kwargs):
     """Implement mocked function requests.get()."""
     assert url
     return _response_no_json(200, """no JSON here""")
 
 
-def mocked_requests_get_value_error(url):
+def mocked_requests_get_value_error(url, **kwargs):
     """Implement mocked function requests.get()."""
     assert url
     return _response_json_value_error(200, """no JSON here""")